@@ -8,16 +8,9 @@ import time
 # Add logic folder to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'logic'))
 
-# Import all main functions
-from logic.partitioning import partition_pdf_to_json
-from logic.cleaning import cleaning
-from logic.isolate_pdf import isolate_pdf
-from logic.extractfitz import extract_fitz
-from logic.extractplumber import extract_plumber
-from logic.merging import reconstruct_document
-from logic.chunking import chunking
-from logic.embedding import vectorize_chunks
-from logic.llm_access import access_llm
+# Pipeline functions are imported inside the page that uses them, so a cold start
+# or a visit to "LLM Access" does not load unstructured, torch or the layout model.
+# Partitioning itself imports unstructured on first use (see load_partitioner).
 
 st.set_page_config(
     page_title="LocalRAG Demo - Interface",
@@ -50,6 +43,11 @@ def run_with_capture(func, *args, **kwargs):
     except Exception as e:
         return output.getvalue(), error_output.getvalue(), str(e)
 
+# PDFs that can be processed into the corpus
+def list_pdfs(folder="inputs"):
+    """Names (without .pdf) of the PDF files in folder"""
+    return sorted(f[:-4] for f in os.listdir(folder) if f.lower().endswith(".pdf"))
+
 # Function to load and display PDF
 def display_pdf(pdf_path="inputs/file_example.pdf"):
     """Load and display PDF file"""
@@ -79,70 +77,86 @@ if page == "Text Processing":
         st.session_state.processing = False
     if 'pipeline_completed' not in st.session_state:
         st.session_state.pipeline_completed = False
+
+    # Document to process; each one gets its own artifacts and index shard
+    pdf_names = list_pdfs()
+    document = st.selectbox(
+        "Document:",
+        pdf_names,
+        index=pdf_names.index("file_example") if "file_example" in pdf_names else 0,
+        disabled=st.session_state.processing
+    )
+    if st.session_state.processing:
+        document = st.session_state.document
     
     # Display completion status if pipeline finished
     if st.session_state.pipeline_completed:
         st.success("✅ **Pipeline completed successfully!** All text processing steps have been executed and the document is ready for LLM queries.")
     
     # Button to start processing (moved to top)
-    if st.button("🚀 Start Text Processing", type="primary", disabled=st.session_state.processing):
+    if st.button("🚀 Start Text Processing", type="primary", disabled=st.session_state.processing or not document):
         st.session_state.processing = True
         st.session_state.current_step = None
         st.session_state.last_completed = None
         st.session_state.pipeline_completed = False
+        st.session_state.document = document
         st.rerun()
     
     # Execute pipeline if processing is active
     if st.session_state.processing:
-        # Define processing steps
+        from logic.partitioning import partition_pdf_to_json
+        from logic.cleaning import cleaning
+        from logic.isolate_pdf import isolate_pdf
+        from logic.extraction import extract_tables
+        from logic.merging import reconstruct_document
+        from logic.chunking import chunking
+        from logic.corpus import add_chunks
+
+        # Define processing steps, with the artifacts of each document kept apart
+        base = f"inputs/{document}"
+        extracts = f"inputs/extracts/{document}"
         steps = [
             {
                 "name": "1. Partition PDF",
                 "func": partition_pdf_to_json,
-                "args": ("inputs/file_example", "inputs/file_example-partitioned"),
-                "kwargs": {}
+                "args": (base, f"{base}-partitioned"),
+                "kwargs": {"strategy": "auto", "keep_workers": True}
             },
             {
                 "name": "2. Cleaning",
                 "func": cleaning,
-                "args": ("inputs/file_example-partitioned", "inputs/file_example-partitioned-cleaned"),
+                "args": (f"{base}-partitioned", f"{base}-partitioned-cleaned"),
                 "kwargs": {}
             },
             {
                 "name": "3. Isolate PDF",
                 "func": isolate_pdf,
-                "args": ("inputs/file_example", "inputs/file_example-partitioned-cleaned", "inputs/extracts/pdf"),
+                "args": (base, f"{base}-partitioned-cleaned", f"{extracts}/pdf"),
                 "kwargs": {}
             },
             {
-                "name": "4. Extract Fitz",
-                "func": extract_fitz,
-                "args": ("inputs/extracts/pdf", "inputs/extracts/fitz"),
+                "name": "4. Extract Tables (Fitz + Plumber)",
+                "func": extract_tables,
+                "args": (f"{extracts}/pdf", f"{extracts}/fitz", f"{extracts}/plumber"),
                 "kwargs": {}
             },
             {
-                "name": "5. Extract Plumber",
-                "func": extract_plumber,
-                "args": ("inputs/extracts/pdf", "inputs/extracts/plumber"),
-                "kwargs": {}
-            },
-            {
-                "name": "6. Merging",
+                "name": "5. Merging",
                 "func": reconstruct_document,
-                "args": ("inputs/extracts/plumber", "inputs/extracts/fitz", "inputs/file_example-partitioned-cleaned"),
-                "kwargs": {}
+                "args": (f"{extracts}/plumber", f"{extracts}/fitz", f"{base}-partitioned-cleaned"),
+                "kwargs": {"sections_path": f"{base}-sections.jsonl", "text_path": f"{base}-reconstituted.txt"}
             },
             {
-                "name": "7. Chunking",
+                "name": "6. Chunking",
                 "func": chunking,
-                "args": ("inputs/file-reconstituted", "inputs/file-chunked"),
+                "args": (f"{base}-sections.jsonl", f"{base}-chunked.jsonl"),
                 "kwargs": {}
             },
             {
-                "name": "8. Vectorization",
-                "func": vectorize_chunks,
-                "args": ("inputs/file-chunked", "inputs/vectorstore"),
-                "kwargs": {}
+                "name": "7. Vectorization",
+                "func": add_chunks,
+                "args": (f"{base}-chunked.jsonl",),
+                "kwargs": {"doc_id": document, "source": f"{base}.pdf"}
             }
         ]
         
@@ -231,7 +245,7 @@ if page == "Text Processing":
     
     # Section to view base PDF file
     st.markdown("### Base Document")
-    pdf_bytes = display_pdf()
+    pdf_bytes = display_pdf(f"inputs/{document}.pdf") if document else None
     if pdf_bytes:
         st.markdown("**PDF Preview:**")
         st.pdf(pdf_bytes)
@@ -257,45 +271,76 @@ elif page == "LLM Access":
     )
     
     
+    # Documents to search, all of them by default
+    from logic.registry import read_registry
+    shards = read_registry()["shards"]
+    doc_ids = st.multiselect("Search in documents:", list(shards), default=list(shards))
+
+    # Optional page range, e.g. "2" or "2-3"
+    page_range = st.text_input("Restrict search to pages (optional):", value="")
+
+    # Hybrid fuses vector and keyword (BM25) results; keyword only skips the query embedding
+    search_modes = {"Hybrid": "hybrid", "Vector": "vector", "Keyword (fast)": "lexical"}
+    search_mode = st.radio("Search mode:", list(search_modes), horizontal=True)
+
     debug_mode = st.checkbox("Debug mode", value=False)
     
     if st.button("🔍 Ask LLM", type="primary"):
-        with st.spinner("Searching and generating response..."):
-            try:
-                output = StringIO()
-                error_output = StringIO()
-                
-                with redirect_stdout(output), redirect_stderr(error_output):
-                    response = access_llm(question, query_semantic, debug_mode)
-                
-                stdout = output.getvalue()
-                stderr = error_output.getvalue()
-                
-                # Display debug output if available
-                if debug_mode and stdout:
-                    with st.expander("Debug Output"):
-                        st.text(stdout)
-                
-                if stderr:
-                    st.warning(f"Warning: {stderr}")
-                
-                # Display LLM response
-                if response:
-                    st.markdown("### 💬 LLM Response")
-                    st.success(response)
-                else:
-                    st.error("No response received from LLM")
-                    
-            except Exception as e:
-                st.error(f"Error: {str(e)}")
+        from logic.llm_access import access_llm_stream
+
+        try:
+            pages = None
+            if page_range.strip():
+                first, _, last = page_range.partition("-")
+                pages = (int(first), int(last or first))
+
+            output = StringIO()
+            error_output = StringIO()
+            metrics = {}
+
+            # Search first, then render the response token by token as the LLM generates it
+            with st.spinner("Searching..."), redirect_stdout(output), redirect_stderr(error_output):
+                tokens = access_llm_stream(
+                    question, query_semantic, debug_mode, pages=pages, doc_ids=doc_ids, metrics=metrics,
+                    mode=search_modes[search_mode]
+                )
+
+            st.markdown("### 💬 LLM Response")
+            with redirect_stdout(output), redirect_stderr(error_output):
+                response = st.write_stream(tokens)
+
+            stdout = output.getvalue()
+            stderr = error_output.getvalue()
+
+            if response and metrics["cached"]:
+                st.caption(f"Search {metrics['retrieval']:.2f}s · cached answer")
+            elif response:
+                st.caption(
+                    f"Search {metrics['retrieval']:.2f}s · first token {metrics['ttft']:.2f}s · "
+                    f"{metrics['tokens']} tokens at {metrics['tokens_per_second']:.1f} tokens/s"
+                )
+            else:
+                st.error("No response received from LLM")
+
+            # Display debug output if available
+            if debug_mode and stdout:
+                with st.expander("Debug Output"):
+                    st.text(stdout)
+
+            if stderr:
+                st.warning(f"Warning: {stderr}")
+
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
     
     st.markdown("---")
     
-    # Section to view base PDF file
-    st.markdown("### Base Document")
-    pdf_bytes = display_pdf()
-    if pdf_bytes:
-        st.markdown("**PDF Preview:**")
-        st.pdf(pdf_bytes)
+    # Section to view the searched PDF files
+    for doc_id in doc_ids:
+        st.markdown(f"### Document: {doc_id}")
+        pdf_bytes = display_pdf(shards[doc_id]["source"]) if shards[doc_id]["source"] else None
+        if pdf_bytes:
+            st.markdown("**PDF Preview:**")
+            st.pdf(pdf_bytes)
     
   
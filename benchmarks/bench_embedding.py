@@ -0,0 +1,113 @@
+"""Measure embedding throughput against a local stub of Ollama's /api/embed.
+
+The stub returns deterministic vectors (seeded by a hash of each text) after
+a latency of --request-ms plus --text-ms per text, and can fail a share of
+requests with HTTP 503 to exercise retries. The default OllamaEmbeddings
+path is compared with OllamaEmbedClient at several batch sizes and
+concurrency levels, and the vectors are checked to be identical.
+Run from the repository root:
+
+    python benchmarks/bench_embedding.py --chunks 2000
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "logic"))
+
+from embed_client import OllamaEmbedClient
+
+DIMENSIONS = 768
+
+
+def stub_vector(text):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(DIMENSIONS)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_stub_handler(request_ms, text_ms, failure_rate):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            time.sleep((request_ms + text_ms * len(texts)) / 1000)
+            if random.random() < failure_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            payload = json.dumps({"model": body["model"], "embeddings": [stub_vector(t) for t in texts]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub(request_ms, text_ms, failure_rate):
+    """Serve the stub on a free local port in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler(request_ms, text_ms, failure_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def timed(embedder, texts):
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        vectors = embedder.embed_documents(texts)
+    return vectors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--request-ms", type=float, default=20.0)
+    parser.add_argument("--text-ms", type=float, default=2.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    texts = [f"chunk {i}: " + "lorem ipsum " * (i % 50) for i in range(args.chunks)]
+    expected = [stub_vector(t) for t in texts]
+    server, base_url = start_stub(args.request_ms, args.text_ms, args.failure_rate)
+
+    try:
+        from langchain_ollama import OllamaEmbeddings
+        random.seed(0)
+        baseline = OllamaEmbeddings(model="nomic-embed-text", base_url=base_url)
+        try:
+            _, seconds = timed(baseline, texts)
+            print(f"OllamaEmbeddings (one request, no retry): {args.chunks / seconds:.0f} chunks/s")
+        except Exception as e:
+            print(f"OllamaEmbeddings (one request, no retry): failed ({type(e).__name__})")
+
+        for batch_size, concurrency in ((32, 1), (32, 4), (64, 8), (128, 8)):
+            random.seed(0)
+            client = OllamaEmbedClient(base_url=base_url, batch_size=batch_size, concurrency=concurrency)
+            vectors, seconds = timed(client, texts)
+            client.close()
+            same = np.allclose(np.array(vectors), np.array(expected))
+            print(
+                f"OllamaEmbedClient batch {batch_size:>3}, concurrency {concurrency}: "
+                f"{args.chunks / seconds:.0f} chunks/s, {client.retries} retries, vectors identical: {same}"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
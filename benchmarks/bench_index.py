@@ -0,0 +1,93 @@
+"""Compare FAISS index types on recall@k against exact search, latency and size.
+
+Vectors are synthetic: normalized points drawn around --clusters random
+centres (real embeddings are clustered too), with queries drawn the same way.
+Each index from index_factory is built, then searched one query at a time
+for each nprobe / efSearch setting; recall@k is the share of the exact
+(Flat) top-k found. Run from the repository root:
+
+    python benchmarks/bench_index.py --vectors 200000 --dimension 768
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "logic"))
+
+from index_factory import build_index, set_search_params
+
+
+def clustered_vectors(rng, n, dimension, centres, spread=0.5):
+    points = centres[rng.integers(len(centres), size=n)] + spread * rng.standard_normal((n, dimension))
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    return points.astype(np.float32)
+
+
+def search_each(index, queries, k):
+    """Search queries one at a time, as semantic_search does; returns (ids, latencies in ms)."""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids[i] = index.search(query[None, :], k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return ids, latencies
+
+
+def recall_at_k(ids, exact_ids):
+    return np.mean([len(set(found) & set(exact)) / len(exact) for found, exact in zip(ids, exact_ids)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--types", default="flat,hnsw,ivf_flat,ivf_pq")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((args.clusters, args.dimension))
+    vectors = clustered_vectors(rng, args.vectors, args.dimension, centres)
+    queries = clustered_vectors(rng, args.queries, args.dimension, centres)
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(vectors)
+    exact_ids, _ = search_each(exact, queries, args.k)
+
+    print(f"{args.vectors} vectors of {args.dimension} dimensions, {args.queries} queries, recall@{args.k}")
+    print(f"{'index':<22} {'setting':<12} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'size MB':>8} {'build s':>8}")
+    for index_type in args.types.split(","):
+        start = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            index, metadata = build_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        if metadata["index_type"] == "hnsw":
+            settings = [("efSearch", value, {"ef_search": value}) for value in (16, 32, 64, 128, 256)]
+        elif metadata["index_type"] in ("ivf_flat", "ivf_pq"):
+            settings = [("nprobe", value, {"nprobe": value}) for value in (1, 4, 16, 64)]
+        else:
+            settings = [("exact", "", {})]
+
+        for name, value, params in settings:
+            set_search_params(index, **params)
+            ids, latencies = search_each(index, queries, args.k)
+            print(
+                f"{metadata['factory']:<22} {name + ' ' + str(value):<12} {recall_at_k(ids, exact_ids):>7.3f} "
+                f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f} "
+                f"{size_mb:>8.1f} {build_seconds:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
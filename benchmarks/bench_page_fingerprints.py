@@ -0,0 +1,70 @@
+"""Check and time the page fingerprints the partition cache is keyed by.
+
+Pages whose text sits inside a Form XObject (merged or stamped PDFs) must
+get different fingerprints when that text differs, and annotations must
+count too, while fingerprinting stays cheap next to partitioning. Run from
+the repository root:
+
+    python benchmarks/bench_page_fingerprints.py --copies 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "logic"))
+
+from partition_cache import page_fingerprints
+
+
+def form_xobject_pdf(path, text, annotation=None):
+    """A one-page PDF showing another page (holding text) as a Form XObject."""
+    with fitz.open() as source, fitz.open() as merged:
+        source.new_page().insert_text((72, 72), text)
+        page = merged.new_page()
+        page.show_pdf_page(page.rect, source, 0)
+        if annotation:
+            page.add_text_annot((100, 100), annotation)
+        merged.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="inputs/file_example.pdf")
+    parser.add_argument("--copies", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        base = page_fingerprints(form_xobject_pdf(os.path.join(folder, "a.pdf"), "Revenue 100"))
+        checks = {
+            "Form XObject text changes the fingerprint": base
+            != page_fingerprints(form_xobject_pdf(os.path.join(folder, "b.pdf"), "Revenue 999")),
+            "annotations change the fingerprint": base
+            != page_fingerprints(form_xobject_pdf(os.path.join(folder, "c.pdf"), "Revenue 100", "note")),
+            "fingerprints are stable": base
+            == page_fingerprints(form_xobject_pdf(os.path.join(folder, "d.pdf"), "Revenue 100")),
+        }
+
+        large_pdf = os.path.join(folder, "large.pdf")
+        with fitz.open(args.pdf) as src, fitz.open() as large:
+            for _ in range(args.copies):
+                large.insert_pdf(src)
+            pages = large.page_count
+            large.save(large_pdf)
+        start = time.perf_counter()
+        page_fingerprints(large_pdf)
+        seconds = time.perf_counter() - start
+
+    for check, passed in checks.items():
+        print(f"{'[OK]' if passed else '[ERROR]'} {check}")
+    print(f"{pages} pages fingerprinted in {seconds * 1000:.0f} ms ({seconds * 1000 / pages:.2f} ms/page)")
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measure search throughput of the retriever while a document is re-ingested.
+
+A corpus with one document of --chunks chunks is built with deterministic
+fake embeddings, then --readers threads search it through a Retriever,
+first idle and then while a separate, niced process re-ingests the
+document --versions times (each run publishes a new index version). Every
+search is checked to return the exact chunk it asked for. Run from the
+repository root:
+
+    python benchmarks/bench_publication.py --chunks 20000 --versions 3
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "logic"))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import embedding
+from artifacts import write_jsonl
+from chunking import number_chunks
+from corpus import add_chunks
+from retriever import Retriever
+
+DIMENSIONS = 256
+
+
+def ingest(corpus_folder, chunks, generation):
+    """Write the document's chunks (one of them naming the generation) and add it to the corpus."""
+    path = os.path.join(corpus_folder, "doc-chunked.jsonl")
+    write_jsonl(path, number_chunks([f"doc text {i}" for i in range(chunks)] + [f"doc generation {generation}"]))
+    add_chunks(path, doc_id="doc", corpus_folder=corpus_folder)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--versions", type=int, default=3)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=3.0, help="idle measurement time")
+    parser.add_argument("--ingest", help=argparse.SUPPRESS)  # corpus folder, in the ingestion process
+    args = parser.parse_args()
+
+    embeddings = DeterministicFakeEmbedding(size=DIMENSIONS)
+    embedding.cached_client = lambda base_url=None: embeddings
+
+    if args.ingest:
+        os.nice(19)
+        with redirect_stdout(StringIO()):
+            for generation in range(1, args.versions + 1):
+                ingest(args.ingest, args.chunks, generation)
+        return
+
+    corpus_folder = tempfile.mkdtemp()
+    with redirect_stdout(StringIO()):
+        ingest(corpus_folder, args.chunks, 0)
+        retriever = Retriever(corpus_folder, embeddings=embeddings, poll_interval=0.2)
+
+    count = [0]
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            query = f"doc text {random.randrange(100)}"
+            try:
+                with redirect_stdout(StringIO()):
+                    results = retriever.search(query, k=1)
+                if results[0].page_content != query:
+                    errors.append(f"{query!r} returned {results[0].page_content!r}")
+            except Exception as e:
+                errors.append(repr(e))
+            count[0] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.seconds)
+    idle = count[0] / args.seconds
+
+    count[0] = 0
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, __file__, "--ingest", corpus_folder, "--chunks", str(args.chunks), "--versions", str(args.versions)],
+        check=True,
+    )
+    busy = count[0] / (time.perf_counter() - start)
+    time.sleep(1)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latest = retriever.search(f"doc generation {args.versions}", k=1)[0].page_content
+    print(f"{args.chunks} chunks, {args.readers} reader threads, {args.versions} versions published")
+    print(f"searches/s idle:             {idle:.0f}")
+    print(f"searches/s during ingestion: {busy:.0f} ({busy / idle:.0%})")
+    print(f"reloads: {retriever.reloads}, errors: {len(errors)}, latest version served: {latest!r}")
+    for error in errors[:5]:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare the isolate -> extract_fitz -> extract_plumber path with direct extraction.
+
+A table-heavy PDF is built by repeating the sample document, so every copy
+brings its tables along. Run from the repository root:
+
+    python benchmarks/bench_table_extraction.py --copies 50
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "logic"))
+
+from extract_direct import extract_tables_direct
+from extractfitz import extract_fitz
+from extractplumber import extract_plumber
+from isolate_pdf import isolate_tables
+
+
+def build_table_heavy_pdf(pdf_file, elements, copies, output_pdf):
+    """Repeat a PDF copies times and shift the element page numbers accordingly."""
+    src = fitz.open(pdf_file)
+    doc = fitz.open()
+    all_elements = []
+    for i in range(copies):
+        doc.insert_pdf(src)
+        for el in elements:
+            el = copy.deepcopy(el)
+            el["element_id"] = f"{el['element_id']}_{i}"
+            el["metadata"]["page_number"] += i * src.page_count
+            all_elements.append(el)
+    doc.save(output_pdf)
+    src.close()
+    doc.close()
+    return all_elements
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="inputs/file_example.pdf")
+    parser.add_argument("--elements", default="inputs/file_example-partitioned-cleaned.json")
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--engine", default="auto", choices=["auto", "fitz", "plumber"])
+    args = parser.parse_args()
+
+    with open(args.elements, "r", encoding="utf-8") as f:
+        elements = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_file = os.path.join(tmp, "tables.pdf")
+        elements = build_table_heavy_pdf(args.pdf, elements, args.copies, pdf_file)
+        table_count = sum(1 for el in elements if el["type"] == "Table")
+        folders = {name: os.path.join(tmp, name) for name in ("pdf", "fitz", "plumber")}
+        for folder in folders.values():
+            os.makedirs(folder)
+
+        _, t_isolate = timed(isolate_tables, pdf_file, elements, folders["pdf"])
+        _, t_fitz = timed(extract_fitz, folders["pdf"], folders["fitz"])
+        _, t_plumber = timed(extract_plumber, folders["pdf"], folders["plumber"], engine=args.engine)
+        (fitz_tables, plumber_tables), t_direct = timed(extract_tables_direct, pdf_file, elements, engine=args.engine)
+        _, t_direct_plumber = timed(extract_tables_direct, pdf_file, elements, engine="plumber")
+
+        same_fitz = sum(
+            1 for element_id, text in fitz_tables.items()
+            if open(os.path.join(folders["fitz"], f"{element_id}.txt"), encoding="utf-8").read() == text
+        )
+        same_plumber = sum(
+            1 for element_id, text in plumber_tables.items()
+            if os.path.exists(os.path.join(folders["plumber"], f"{element_id}.txt"))
+            and open(os.path.join(folders["plumber"], f"{element_id}.txt"), encoding="utf-8").read() == text
+        )
+
+    three_step = t_isolate + t_fitz + t_plumber
+    print(f"{table_count} tables on {args.copies} copies of {args.pdf}")
+    print(f"three-step: {three_step:.2f}s (isolate {t_isolate:.2f}s, fitz {t_fitz:.2f}s, plumber {t_plumber:.2f}s)")
+    print(f"direct:     {t_direct:.2f}s ({three_step / t_direct:.1f}x), table engine {args.engine}")
+    print(f"direct, pdfplumber only: {t_direct_plumber:.2f}s")
+    print(f"identical output: fitz {same_fitz}/{len(fitz_tables)}, plumber {same_plumber}/{len(plumber_tables)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compare the size of the reconstructed document with both table versions and with one.
+
+Chunks are counted with the pipeline's chunker. Tokens are approximated as
+word and punctuation pieces, which tracks the embedding tokenizer closely
+enough for a relative comparison. Run from the repository root:
+
+    python benchmarks/bench_table_selection.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "logic"))
+
+from chunking import split_text_with_separator
+from merging import reconstruct_text
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def measure(elements, plumber_folder, fitz_folder, tables):
+    with redirect_stdout(StringIO()):
+        text = reconstruct_text(elements, plumber_folder, fitz_folder, tables)
+    chunks = split_text_with_separator(text)
+    tokens = sum(len(TOKEN_PATTERN.findall(chunk)) for chunk in chunks)
+    return len(text), len(chunks), tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--elements", default="inputs/file_example-partitioned-cleaned.json")
+    parser.add_argument("--plumber", default="inputs/extracts/plumber")
+    parser.add_argument("--fitz", default="inputs/extracts/fitz")
+    args = parser.parse_args()
+
+    with open(args.elements, "r", encoding="utf-8") as f:
+        elements = json.load(f)
+
+    both = measure(elements, args.plumber, args.fitz, "both")
+    best = measure(elements, args.plumber, args.fitz, "best")
+    for name, (chars, chunks, tokens) in (("both versions", both), ("selected", best)):
+        print(f"{name:>13}: {chars} chars, {chunks} chunks, ~{tokens} tokens")
+    print(f"saved: {both[1] - best[1]} chunks, ~{both[2] - best[2]} tokens ({1 - best[2] / both[2]:.0%})")
+
+
+if __name__ == "__main__":
+    main()
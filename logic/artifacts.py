@@ -0,0 +1,22 @@
+import json
+import os
+
+
+def write_jsonl(path, records):
+    """Write records as compact JSON Lines, one record per line."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path):
+    """Yield the records of a JSON Lines file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -1,78 +1,191 @@
-import json
+import hashlib
 import os
+from collections import Counter
 
-def chunk_text_with_separator(
-    input_file,
-    separator="-------------------------------------------------------------",
+from artifacts import read_jsonl, write_jsonl
+
+SEPARATOR = "-------------------------------------------------------------"
+
+
+def merge_metadata(metadatas):
+    """Combine the metadata of the sections packed into one chunk."""
+    pages = [m[key] for m in metadatas for key in ("page_start", "page_end") if m.get(key) is not None]
+    return {
+        "page_start": min(pages) if pages else None,
+        "page_end": max(pages) if pages else None,
+        "element_ids": [element_id for m in metadatas for element_id in m.get("element_ids", [])],
+        "table_ids": [m["table_id"] for m in metadatas if m.get("table_id")],
+        "titles": list(dict.fromkeys(m["title"] for m in metadatas if m.get("title"))),
+    }
+
+
+def chunk_sections(
+    sections,
+    separator=SEPARATOR,
     max_chunk_size=1000,
     overlap=100
 ):
+    """Pack a stream of sections (see merging.iter_sections) into chunks.
+
+    Small sections are grouped up to max_chunk_size and larger ones are cut
+    into overlapping windows. Yields {"text", "metadata"} dicts whose metadata
+    holds the page range, element ids, table ids and titles they come from.
+    """
     # Prevent invalid overlap configuration
     if overlap >= max_chunk_size:
         overlap = max_chunk_size // 2
 
-    # Read full text
-    with open(input_file, "r", encoding="utf-8") as f:
-        text = f.read()
-
-    # Split text using the separator and clean empty parts
-    parts = [p.strip() for p in text.split(separator) if p.strip()]
+    # Parts of the chunk being built, joined once when it is emitted
+    current_parts = []
+    current_meta = []
+    current_size = 0
 
-    chunks = []
-    current_chunk = ""
-
-    for part in parts:
-        part_text = f"{separator}\n{part}"
+    for section in sections:
+        part = section["text"].strip()
+        if not part:
+            continue
+        part_size = len(separator) + 1 + len(part)
 
         # If part is larger than max_chunk_size, split it with overlap
-        if len(part_text) > max_chunk_size:
+        if part_size > max_chunk_size:
+            part_text = f"{separator}\n{part}"
+            metadata = merge_metadata([section])
             start = 0
             while start < len(part_text):
                 end = min(start + max_chunk_size, len(part_text))
                 chunk_text = part_text[start:end]
-                chunks.append(chunk_text.strip())
+                yield {"text": chunk_text.strip(), "metadata": metadata}
                 start += max_chunk_size - overlap
         else:
             # Add smaller parts to the current chunk
-            if len(current_chunk) + len(part_text) <= max_chunk_size:
-                current_chunk += "\n" + part_text
+            if current_size + part_size <= max_chunk_size:
+                current_parts.append(part)
+                current_meta.append(section)
+                current_size += 1 + part_size
             else:
-                chunks.append(current_chunk.strip())
-                current_chunk = part_text
+                yield {"text": join_parts(current_parts, separator), "metadata": merge_metadata(current_meta)}
+                current_parts = [part]
+                current_meta = [section]
+                current_size = part_size
 
     # Add any remaining text
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    if current_parts:
+        yield {"text": join_parts(current_parts, separator), "metadata": merge_metadata(current_meta)}
+
+
+def join_parts(parts, separator=SEPARATOR):
+    """Build a chunk's text from its parts, each opened by the separator line."""
+    return "\n".join(f"{separator}\n{part}" for part in parts)
+
+
+def iter_text_sections(input_file, separator=SEPARATOR, block_size=1 << 20):
+    """Yield the separator-delimited parts of a text file as sections, reading it block by block.
+
+    Only the current part is held in memory, and each character is scanned
+    a bounded number of times.
+    """
+    keep = len(separator) - 1  # enough to catch a separator cut by a block boundary
+    pending = []
+    tail = ""
+    with open(input_file, "r", encoding="utf-8") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            pieces = (tail + block).split(separator)
+            for piece in pieces[:-1]:
+                pending.append(piece)
+                yield {"text": "".join(pending)}
+                pending = []
+            last = pieces[-1]
+            if len(last) > keep:
+                pending.append(last[:-keep] if keep else last)
+                tail = last[-keep:] if keep else ""
+            else:
+                tail = last
+    pending.append(tail)
+    yield {"text": "".join(pending)}
+
 
-    return chunks
+def split_text_with_separator(
+    text,
+    separator=SEPARATOR,
+    max_chunk_size=1000,
+    overlap=100
+):
+    """Chunk a reconstructed text on its separator lines (chunks carry no metadata)."""
+    sections = ({"text": part} for part in text.split(separator))
+    return [chunk["text"] for chunk in chunk_sections(sections, separator, max_chunk_size, overlap)]
+
+
+def chunk_text_with_separator(
+    input_file,
+    separator=SEPARATOR,
+    max_chunk_size=1000,
+    overlap=100
+):
+    """Chunk a reconstructed text file, streaming it from disk (chunks carry no metadata)."""
+    sections = iter_text_sections(input_file, separator)
+    return [chunk["text"] for chunk in chunk_sections(sections, separator, max_chunk_size, overlap)]
 
 
-def chunking(input_path, output_path):
+def chunk_id(text):
+    """Stable id of a chunk: a hash of its text with whitespace normalized."""
+    normalized = " ".join(text.split())
+    return "chunk_" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def iter_numbered_chunks(chunks):
+    """Give each chunk (a text or a {"text", "metadata"} dict) its chunk_id and position, lazily.
+
+    Ids come from the chunk content, so an unchanged chunk keeps its id when
+    the rest of the document changes; repeated texts get a _2, _3... suffix.
+    """
+    seen = Counter()
+    for i, chunk in enumerate(chunks):
+        record = chunk if isinstance(chunk, dict) else {"text": chunk}
+        base_id = chunk_id(record["text"])
+        seen[base_id] += 1
+        unique_id = base_id if seen[base_id] == 1 else f"{base_id}_{seen[base_id]}"
+        yield {"chunk_id": unique_id, "position": i + 1, **record}
+
+
+def number_chunks(chunks):
+    """Give each chunk (a text or a {"text", "metadata"} dict) its chunk_id and position."""
+    return list(iter_numbered_chunks(chunks))
+
+
+def chunking(input_path, output_path, max_tokens=None):
+    """Chunk a sections file (.jsonl, see reconstruct_document) or a reconstructed text file.
+
+    The input is streamed and the chunks are written to output_path as JSON
+    Lines as they are produced. With max_tokens, sections are packed by token
+    count with the embedding model's tokenizer (see token_chunking) instead
+    of by characters.
+    """
     # Ensure correct file extensions
-    if not input_path.endswith(".txt"):
+    if not input_path.endswith((".txt", ".jsonl")):
         input_path += ".txt"
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"File not found: {input_path}")
 
-    if not output_path.endswith(".json"):
-        output_path += ".json"
+    if not output_path.endswith(".jsonl"):
+        output_path += ".jsonl"
 
     # Perform chunking
-    chunks = chunk_text_with_separator(input_path)
-
+    if input_path.endswith(".jsonl"):
+        sections = read_jsonl(input_path)
+    else:
+        sections = iter_text_sections(input_path)
 
-    # Create JSON structure
-    json_chunks = [
-        {"chunk_id": f"chunk_{i+1:03d}", "text": chunk}
-        for i, chunk in enumerate(chunks)
-    ]
+    if max_tokens:
+        from token_chunking import chunk_sections_by_tokens
+        chunks = chunk_sections_by_tokens(sections, max_tokens=max_tokens)
+    else:
+        chunks = chunk_sections(sections)
 
-    # Save as JSON file
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(json_chunks, f, ensure_ascii=False, indent=2)
+    # Save as JSON Lines, one chunk at a time
+    count = write_jsonl(output_path, iter_numbered_chunks(chunks))
 
-    print(f"[OK] Saved {len(chunks)} chunks to {output_path}")
+    print(f"[OK] Saved {count} chunks to {output_path}")
 
 
 if __name__ == "__main__":
-    chunking("inputs/file-reconstituted", "inputs/file-chunked")
+    chunking("inputs/file-sections.jsonl", "inputs/file-chunked.jsonl")
@@ -1,17 +1,9 @@
 import json
 
 
-def cleaning(json_partitioned, json_cleaned):
-    print("[INFO] Starting cleaning process...")
-    input_json_path = f"{json_partitioned}.json"
-    output_json_path = f"{json_cleaned}.json"
-
-    # Load partitioned JSON file
-    with open(input_json_path, "r", encoding="utf-8") as f:
-        elements = json.load(f)
-
+def clean_elements(elements):
+    """Drop footers (including low "UFO" elements) and images from a list of element dicts."""
     cleaned_elements = []
-    cleaned_count = 0
 
     # Identify "UFOs" (unidentified visual objects, e.g. unwanted visual elements)
     for el in elements:
@@ -23,13 +15,26 @@ def cleaning(json_partitioned, json_cleaned):
     for el2 in elements:
         if el2.get("type", {}) not in ("Footer", "Image"):
             cleaned_elements.append(el2)
-            cleaned_count += 1
+
+    return cleaned_elements
+
+
+def cleaning(json_partitioned, json_cleaned):
+    print("[INFO] Starting cleaning process...")
+    input_json_path = f"{json_partitioned}.json"
+    output_json_path = f"{json_cleaned}.json"
+
+    # Load partitioned JSON file
+    with open(input_json_path, "r", encoding="utf-8") as f:
+        elements = json.load(f)
+
+    cleaned_elements = clean_elements(elements)
 
     # Save cleaned JSON
     with open(output_json_path, "w", encoding="utf-8") as f:
         json.dump(cleaned_elements, f, ensure_ascii=False, indent=2)
 
-    print(f"[OK] Cleaned JSON saved: {output_json_path} ({cleaned_count} elements)")
+    print(f"[OK] Cleaned JSON saved: {output_json_path} ({len(cleaned_elements)} elements)")
     return
 
 
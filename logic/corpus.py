@@ -0,0 +1,184 @@
+import heapq
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding import vectorize_chunks
+from embedding_cache import cached_client
+from lexical_index import rrf_fuse
+from registry import CORPUS_FOLDER, document_id, read_registry, registry_lock, shard_folder, write_registry
+from vector_store import (
+    FUSION_CANDIDATES,
+    fuse_results,
+    lexical_search,
+    load_lexical,
+    load_store,
+    search_store,
+    store_exists,
+    store_meta,
+)
+
+ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+
+SEARCH_WORKERS = 4
+
+
+def register_shard(corpus_folder, doc_id, source=None):
+    """Record the shard of doc_id (already vectorized) in the registry."""
+    folder = shard_folder(corpus_folder, doc_id)
+    if not store_exists(folder):
+        raise RuntimeError(f"Vectorization of {doc_id} failed, no index in {folder}")
+    metadata = store_meta(folder)
+
+    with registry_lock(corpus_folder):
+        registry = read_registry(corpus_folder)
+        registry["shards"][doc_id] = {
+            "folder": os.path.relpath(folder, corpus_folder),
+            "source": source,
+            "chunks": metadata["ntotal"],
+            "index_type": metadata["index_type"],
+            "storage": metadata.get("storage", "float32"),
+            "version": metadata.get("version"),
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        write_registry(corpus_folder, registry)
+    print(f"[OK] Document {doc_id} registered: {metadata['ntotal']} chunks in {folder}")
+
+
+def add_chunks(chunks_path, doc_id=None, source=None, corpus_folder=CORPUS_FOLDER, **vectorize_kwargs):
+    """Vectorize a document's chunks file into its own shard and register it; returns the doc_id.
+
+    Only that shard is written: the shard is updated incrementally when the
+    document was already added, and the other shards are left untouched.
+    """
+    doc_id = doc_id or document_id(source or chunks_path)
+    folder = shard_folder(corpus_folder, doc_id)
+    if vectorize_chunks(chunks_path, folder, incremental=True, **vectorize_kwargs) is None:
+        raise RuntimeError(f"Vectorization of {doc_id} failed")
+    register_shard(corpus_folder, doc_id, source)
+    return doc_id
+
+
+def add_document(pdf_path, doc_id=None, corpus_folder=CORPUS_FOLDER, **pipeline_kwargs):
+    """Run the whole pipeline on a PDF (path without .pdf) into its own shard and register it."""
+    from pipeline import run_pipeline
+
+    doc_id = doc_id or document_id(pdf_path)
+    if run_pipeline(pdf_path, shard_folder(corpus_folder, doc_id), incremental=True, **pipeline_kwargs) is None:
+        raise RuntimeError(f"Vectorization of {doc_id} failed")
+    register_shard(corpus_folder, doc_id, pdf_path + ".pdf")
+    return doc_id
+
+
+def remove_document(doc_id, corpus_folder=CORPUS_FOLDER):
+    """Unregister a document, then delete its shard."""
+    with registry_lock(corpus_folder):
+        registry = read_registry(corpus_folder)
+        if doc_id not in registry["shards"]:
+            print(f"[ERROR] Unknown document: {doc_id}")
+            return False
+        del registry["shards"][doc_id]
+        write_registry(corpus_folder, registry)
+    shutil.rmtree(shard_folder(corpus_folder, doc_id), ignore_errors=True)
+    print(f"[OK] Document {doc_id} removed")
+    return True
+
+
+def search_shards(stores, vector, k=3, pages=None, workers=SEARCH_WORKERS, query=None, mode="vector"):
+    """Search loaded shards ({doc_id: (db, metadata, lexical)}) in parallel and merge the top k.
+
+    FAISS releases the GIL, so the shards are searched in a thread pool. The
+    vector hits of all shards are merged by distance; BM25 scores depend on
+    each shard's term statistics, so the BM25 hits of query are merged by
+    reciprocal-rank fusion of the shard rankings. Both are then combined
+    according to mode (see
+    vector_store.fuse_results); vector may be None in lexical mode. Each
+    result has its doc_id and the version of its shard (index_version) in
+    the metadata. Shards without a lexical index are searched by vector.
+    """
+    fetch_k = k if mode == "vector" else FUSION_CANDIDATES * k
+
+    def search_shard(doc_id):
+        db, metadata, lexical = stores[doc_id]
+        vector_hits = search_store(db, metadata, vector, fetch_k, pages) if mode != "lexical" or lexical is None else []
+        lexical_hits = lexical_search(db, lexical, query, fetch_k, pages) if mode != "vector" and lexical else []
+        for doc, _ in vector_hits + lexical_hits:
+            doc.metadata["doc_id"] = doc_id
+            doc.metadata["index_version"] = metadata.get("version")
+        return vector_hits, lexical_hits
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(stores)))) as pool:
+        shard_hits = list(pool.map(search_shard, stores))
+    vector_hits = heapq.nsmallest(fetch_k, (hit for hits, _ in shard_hits for hit in hits), key=lambda hit: hit[1])
+    fused = rrf_fuse((hits for _, hits in shard_hits), key=lambda hit: id(hit[0]))  # shards share no hits
+    lexical_hits = [(doc, score) for (doc, _), score in fused[:fetch_k]]
+    if mode == "lexical" and vector_hits:
+        mode = "hybrid"  # some shards could only be searched by vector
+    return fuse_results(vector_hits, lexical_hits, k, mode)
+
+
+def select_shards(shards, doc_ids, corpus_folder=CORPUS_FOLDER):
+    """The registry entries of doc_ids (all of them when doc_ids is empty)."""
+    if doc_ids:
+        unknown = [doc_id for doc_id in doc_ids if doc_id not in shards]
+        if unknown:
+            raise ValueError(f"Unknown documents: {', '.join(unknown)}")
+        shards = {doc_id: shards[doc_id] for doc_id in doc_ids}
+    if not shards:
+        raise FileNotFoundError(f"No documents in {corpus_folder}, add one first")
+    return shards
+
+
+def print_results(results):
+    for i, doc in enumerate(results):
+        print(
+            f"[DEBUG] RAG SEM result {i+1} doc_id={doc.metadata['doc_id']} "
+            f"chunk_id={doc.metadata.get('chunk_id', 'unknown')} "
+            f"pages={doc.metadata.get('page_start')}-{doc.metadata.get('page_end')}\n{doc.page_content}"
+        )
+
+
+def load_shard(folder, embeddings):
+    """Load a shard for searching; returns (db, metadata, lexical index or None)."""
+    db, metadata = load_store(folder, embeddings)
+    return db, metadata, load_lexical(folder, metadata["version"])
+
+
+def search_corpus(
+    query,
+    corpus_folder=CORPUS_FOLDER,
+    k=3,
+    doc_ids=None,
+    pages=None,
+    debug=False,
+    workers=SEARCH_WORKERS,
+    mode="hybrid"
+):
+    """Search every registered shard, or only those of doc_ids, and merge the top k.
+
+    One-off search: the query is embedded once (not at all in lexical mode)
+    and the shards are loaded (memory-mapped) for this call only; see
+    retriever.Retriever for a long-lived searcher. pages applies to every
+    shard, mode is as in llm_access.semantic_search.
+    """
+    shards = select_shards(read_registry(corpus_folder)["shards"], doc_ids, corpus_folder)
+
+    embeddings = cached_client(base_url=ollama_base_url)
+    stores = {
+        doc_id: load_shard(os.path.join(corpus_folder, shard["folder"]), embeddings)
+        for doc_id, shard in shards.items()
+    }
+    needs_vector = mode != "lexical" or any(lexical is None for _, _, lexical in stores.values())
+    vector = embeddings.embed_query(query) if needs_vector else None
+    results = search_shards(stores, vector, k, pages, workers, query, mode)
+
+    if debug:
+        print_results(results)
+    return results
+
+
+if __name__ == "__main__":
+    add_document("inputs/file_example", strategy="auto")
+    print(json.dumps(read_registry(), indent=2))
@@ -0,0 +1,189 @@
+import asyncio
+import multiprocessing
+from contextlib import asynccontextmanager
+import os
+import threading
+import time
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+
+EMBED_MODEL = "nomic-embed-text"
+BATCH_SIZE = 32
+CONCURRENCY = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled after each failed attempt
+TIMEOUT = 120.0
+
+# Status codes worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class LoopThread:
+    """An event loop running in a daemon thread, for calling coroutines from synchronous code.
+
+    The loop outlives each call, so objects bound to it (an httpx.AsyncClient
+    and its open connections) are reused across calls, from any thread,
+    including threads that already run an event loop.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="embed-client-loop", daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine):
+        """Run a coroutine on the loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class OllamaEmbedClient(Embeddings):
+    """Embeddings from Ollama's /api/embed, sent in batches with bounded concurrency.
+
+    Batches of batch_size texts are posted over one pooled async HTTP client
+    with at most concurrency requests in flight. The client and the event
+    loop of the synchronous methods are created on first use and kept for
+    the life of the object, so connections stay open between calls (see
+    close). Connection errors, timeouts
+    and 408/429/5xx responses are retried with exponential backoff. Each
+    embed_documents call logs its throughput in chunks per second and its
+    own retries; retries totals them over every call.
+    """
+
+    def __init__(
+        self,
+        model=EMBED_MODEL,
+        base_url=None,
+        batch_size=BATCH_SIZE,
+        concurrency=CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        timeout=TIMEOUT,
+        options=None,
+    ):
+        self.model = model
+        self.base_url = base_url or ollama_base_url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.options = options if options is not None else {
+            "num_gpu": 1,
+            "num_thread": max(1, multiprocessing.cpu_count() - 1),
+        }
+        self.retries = 0
+        self._loop_thread = None
+        self._http = None
+        self._lock = threading.Lock()
+        self._retries_lock = threading.Lock()  # not _lock: held by close while it waits on the loop
+
+    def _run(self, coroutine):
+        with self._lock:
+            if self._loop_thread is None:
+                self._loop_thread = LoopThread()
+        return self._loop_thread.run(coroutine)
+
+    def _new_client(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        return httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits)
+
+    @asynccontextmanager
+    async def _client(self):
+        """The pooled HTTP client, kept open on the client's own loop; other
+        event loops (async callers) get one for the duration of the call."""
+        if self._loop_thread is not None and asyncio.get_running_loop() is self._loop_thread.loop:
+            if self._http is None:
+                self._http = self._new_client()
+            yield self._http
+        else:
+            async with self._new_client() as client:
+                yield client
+
+    def close(self):
+        """Close the HTTP connections and stop the event loop, if they were started."""
+        with self._lock:
+            if self._loop_thread is not None:
+                if self._http is not None:
+                    self._loop_thread.run(self._http.aclose())
+                self._loop_thread.stop()
+            self._loop_thread = None
+            self._http = None
+
+    def _payload(self, texts):
+        return {"model": self.model, "input": texts, "options": self.options}
+
+    async def _post_batch(self, client, semaphore, texts):
+        """Embed one batch, retrying transient failures; returns (embeddings, retries)."""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await client.post("/api/embed", json=self._payload(texts))
+                    if response.status_code not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        embeddings = response.json()["embeddings"]
+                        if len(embeddings) != len(texts):
+                            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+                        return embeddings, attempt
+                    error = f"HTTP {response.status_code}"
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    error = repr(e)
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Embedding batch failed after {attempt + 1} attempts: {error}")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    def _count_retries(self, retries):
+        with self._retries_lock:
+            self.retries += retries
+
+    async def _embed_batches(self, texts):
+        """Embed texts in concurrent batches; returns (embeddings, retries of this call)."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._client() as client:
+            tasks = [asyncio.ensure_future(self._post_batch(client, semaphore, batch)) for batch in batches]
+            done_count = 0
+            report_every = max(1, len(batches) // 10)
+            try:
+                for i, future in enumerate(asyncio.as_completed(tasks), start=1):
+                    done_count += len((await future)[0])
+                    if len(batches) > 1 and (i % report_every == 0 or i == len(batches)):
+                        print(f"[INFO] Embedded {done_count}/{len(texts)} chunks")
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                raise
+            # Tasks finish out of order, read the results back in batch order
+            results = [task.result() for task in tasks]
+        retries = sum(batch_retries for _, batch_retries in results)
+        self._count_retries(retries)
+        return [embedding for embeddings, _ in results for embedding in embeddings], retries
+
+    async def aembed_documents(self, texts):
+        return (await self._embed_batches(texts))[0]
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        start = time.perf_counter()
+        embeddings, retries = self._run(self._embed_batches(list(texts)))
+        seconds = time.perf_counter() - start
+        print(
+            f"[INFO] Embedded {len(texts)} chunks in {seconds:.1f}s ({len(texts) / seconds:.1f} chunks/s, "
+            f"batch {self.batch_size}, concurrency {self.concurrency}, {retries} retries)"
+        )
+        return embeddings
+
+    async def aembed_query(self, text):
+        async with self._client() as client:
+            (embedding,), retries = await self._post_batch(client, asyncio.Semaphore(1), [text])
+        self._count_retries(retries)
+        return embedding
+
+    def embed_query(self, text):
+        return self._run(self.aembed_query(text))
@@ -1,69 +1,186 @@
 import json
-import multiprocessing
-from langchain_ollama import OllamaEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 import os
+
+from artifacts import read_jsonl
+from embedding_cache import cached_client
+from index_factory import PQ_BITS, build_index, resolve_index_type, resolve_storage
+from vector_store import load_store, save_store, store_exists, store_meta
+
 ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 
 
-def vectorize_chunks(chunks_json: str, vectorstore_folder: str):
-    chunks_json = chunks_json + ".json"
+def vectorize_chunks(
+    chunks_path: str,
+    vectorstore_folder: str,
+    incremental: bool = False,
+    index_type: str = "flat",
+    storage: str = "float32",
+    **index_params
+):
+    """Embed a chunks file: JSON Lines (see chunking), or a legacy .json list.
+
+    index_type, storage and index_params choose the FAISS index (see index_factory.build_index).
+    Returns the index metadata, or None if it failed.
+    """
+    if not chunks_path.endswith((".json", ".jsonl")):
+        chunks_path += ".jsonl" if os.path.exists(chunks_path + ".jsonl") else ".json"
 
     # 1. Load the chunks
     try:
-        with open(chunks_json, "r", encoding="utf-8") as f:
-            chunks = json.load(f)
+        if chunks_path.endswith(".jsonl"):
+            chunks = list(read_jsonl(chunks_path))
+        else:
+            with open(chunks_path, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
     except Exception as e:
-        print(f"[ERROR] Failed to read JSON file: {e}")
+        print(f"[ERROR] Failed to read chunks file: {e}")
         return
 
-    # 2. Build the documents
-    docs = []
+    return vectorize_documents(
+        chunks, vectorstore_folder, incremental, index_type=index_type, storage=storage, **index_params
+    )
+
+
+def chunk_documents(chunks):
+    """Build the FAISS documents of a list of chunks, keyed by chunk_id."""
+    documents = {}
     for i, chunk in enumerate(chunks):
         text = chunk.get("text", "").strip()
         if text:
-            docs.append(
-                Document(
-                    page_content=text,
-                    metadata={"chunk_id": chunk.get("chunk_id", f"chunk_{i:03d}")},
-                )
-            )
-
-    # 3. Initialize Ollama embeddings
-    try:
-        num_threads = max(1, multiprocessing.cpu_count() - 1)
-        embeddings = OllamaEmbeddings(
-            model="nomic-embed-text",
-            num_gpu=1,
-            base_url=ollama_base_url,
-            num_thread=num_threads,
-        )
-    except Exception as e:
-        print(f"[ERROR] Failed to initialize embeddings: {e}")
-        return
+            chunk_id = chunk.get("chunk_id", f"chunk_{i:03d}")
+            metadata = {"chunk_id": chunk_id, **chunk.get("metadata", {})}
+            if "position" in chunk:
+                metadata["position"] = chunk["position"]
+            documents[chunk_id] = Document(page_content=text, metadata=metadata)
+    return documents
+
+
+def update_index(db, documents):
+    """Bring a loaded FAISS store in line with documents ({chunk_id: Document}).
+
+    Only chunks whose id is not stored yet are embedded; stored chunks that are
+    gone are deleted, and the metadata of the others (pages, position) is
+    refreshed without re-embedding. Returns (added, removed, kept) counts.
+    """
+    stored_ids = set(db.index_to_docstore_id.values())
+    removed_ids = [chunk_id for chunk_id in stored_ids if chunk_id not in documents]
+    added_ids = [chunk_id for chunk_id in documents if chunk_id not in stored_ids]
+    kept_ids = [chunk_id for chunk_id in documents if chunk_id in stored_ids]
+
+    if removed_ids:
+        db.delete(removed_ids)
+    if kept_ids:
+        db.docstore.delete(kept_ids)
+        db.docstore.add({chunk_id: documents[chunk_id] for chunk_id in kept_ids})
+    if added_ids:
+        db.add_documents([documents[chunk_id] for chunk_id in added_ids], ids=added_ids)
 
+    return len(added_ids), len(removed_ids), len(kept_ids)
+
+
+def build_store(documents, embeddings, index_type="flat", storage="float32", **index_params):
+    """Embed documents ({chunk_id: Document}) into a new FAISS store of the given index type.
+
+    Returns (db, metadata), see index_factory.build_index.
+    """
+    chunk_ids = list(documents)
+    vectors = embeddings.embed_documents([documents[chunk_id].page_content for chunk_id in chunk_ids])
+    index, metadata = build_index(vectors, index_type, storage, **index_params)
+    db = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(documents)),
+        index_to_docstore_id=dict(enumerate(chunk_ids)),
+    )
+    return db, metadata
+
+
+def refill_store(db, documents):
+    """Empty a trained store and add documents again, keeping the training (IVF centroids, PQ codebooks)."""
+    db.index.reset()
+    db.docstore = InMemoryDocstore()
+    db.index_to_docstore_id = {}
+    db.add_documents(list(documents.values()), ids=list(documents))
+
+
+def vectorize_documents(
+    chunks,
+    vectorstore_folder: str,
+    incremental: bool = False,
+    embeddings=None,
+    index_type: str = "flat",
+    storage: str = "float32",
+    **index_params
+):
+    """Embed a list of {"chunk_id", "text", "metadata"} dicts and save them as a FAISS index.
+
+    The chunk metadata (page range, element ids, ...) is kept on each document,
+    and chunk ids are used as docstore ids. index_type is "flat", "hnsw",
+    "ivf_flat" or "ivf_pq", and storage "float32", "fp16" or "sq8" (see
+    index_factory); both are recorded next to the index. The store is saved
+    without pickle (see vector_store.save_store). With incremental=True an
+    existing index of the same kind is updated (see update_index) instead of
+    rebuilt. Either way the result is published as a new version of the
+    store, so searches keep using the previous one until it is complete.
+    Returns the index metadata, or None if it failed.
+    """
+    # 2. Build the documents
+    documents = chunk_documents(chunks)
+
+    # 3. Initialize Ollama embeddings (batched, concurrent requests behind the on-disk cache)
+    if embeddings is None:
+        embeddings = cached_client(base_url=ollama_base_url)
 
     # 4. Vectorize the documents
+    db = None
     try:
-        print("[INFO] Vectorization in progress...")
-        db = FAISS.from_documents(docs, embeddings)
+        if incremental and store_exists(vectorstore_folder):
+            metadata = store_meta(vectorstore_folder)
+            stored = (metadata["index_type"], metadata.get("storage", "float32"))
+            # Compare with what a build would give for this many chunks, so a small corpus
+            # that fell back to a simpler index type is not rebuilt on every run
+            expected_type = resolve_index_type(index_type, len(documents), index_params.get("pq_bits", PQ_BITS))
+            expected = (expected_type, resolve_storage(expected_type, storage))
+            if stored != expected:
+                print(f"[INFO] Stored index is {stored[0]} ({stored[1]}), rebuilding it as {expected[0]} ({expected[1]}).")
+            else:
+                index_type = expected_type
+                db, metadata = load_store(vectorstore_folder, embeddings, mmap=False)
+                if index_type != "flat" and set(db.index_to_docstore_id.values()) - set(documents):
+                    # Only flat indexes renumber their vectors on deletion as the docstore mapping
+                    # expects (HNSW cannot delete at all), so start over; embeddings come from the cache
+                    print(f"[INFO] Chunks were removed from the {index_type} index, rebuilding it.")
+                    if index_type == "hnsw":
+                        db = None
+                    else:
+                        refill_store(db, documents)
+                else:
+                    print("[INFO] Incremental vectorization in progress...")
+                    added, removed, kept = update_index(db, documents)
+                    print(f"[INFO] {added} chunks embedded, {removed} removed, {kept} unchanged.")
+        if db is None:
+            print(f"[INFO] Vectorization in progress ({index_type} index, {storage})...")
+            db, metadata = build_store(documents, embeddings, index_type, storage, **index_params)
     except Exception as e:
         print(f"[ERROR] Vectorization failed: {e}")
         return
 
-    # 5. Save FAISS index locally
+    # 5. Save FAISS index locally, as a new published version
     try:
-        db.save_local(vectorstore_folder)
-        print(f"[OK] Vectorization completed successfully. Folder: {vectorstore_folder}")
+        metadata["ntotal"] = db.index.ntotal
+        metadata["version"] = save_store(db, vectorstore_folder, metadata)
+        print(f"[OK] Vectorization completed successfully. Folder: {vectorstore_folder}, version {metadata['version']}")
     except Exception as e:
         print(f"[ERROR] Failed to save FAISS index: {e}")
         return
+    return metadata
 
 
-# Run from terminal
+# Run from terminal: re-embed the example document into its corpus shard
 if __name__ == "__main__":
-    vectorize_chunks(
-        chunks_json="inputs/file-chunked",
-        vectorstore_folder="inputs/vectorstore"
-    )
+    from corpus import add_chunks
+
+    add_chunks("inputs/file-chunked.json", doc_id="file_example", source="inputs/file_example.pdf")
@@ -0,0 +1,209 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embed_client import EMBED_MODEL, OllamaEmbedClient
+
+CACHE_PATH = "inputs/cache/embeddings.sqlite"
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+FLUSH_INTERVAL = 60.0  # seconds between writes of the buffered last_used times and counters
+
+
+def text_hash(text):
+    """SHA-256 of a text with whitespace normalized."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk cache of embeddings in SQLite, keyed by (model, normalized text hash).
+
+    Vectors are stored as float32 blobs. Every hit refreshes the entry's
+    last_used time, and once the vectors take more than max_bytes the least
+    recently used are evicted. Hits and misses are counted per session and
+    in total. Lookups only read: the last_used times and counters they
+    change are buffered and written with the next put_many, at most every
+    flush_interval seconds, or on close.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._last_used = {}  # (model, text_hash) -> time of the last hit not written yet
+        self._counts = {"hits": 0, "misses": 0}  # not written yet
+        self._flushed = time.monotonic()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.commit()
+        atexit.register(self.close)
+
+    def get_many(self, model, texts):
+        """Return the cached vector of each text (None on a miss)."""
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique), 500):  # stay under SQLite's variable limit
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                found.update((h, np.frombuffer(blob, dtype=np.float32).tolist()) for h, blob in rows)
+            now = time.time()
+            self._last_used.update(((model, h), now) for h in found)
+
+            vectors = [found.get(h) for h in hashes]
+            hits = sum(1 for vector in vectors if vector is not None)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+            self._counts["hits"] += hits
+            self._counts["misses"] += len(vectors) - hits
+            if time.monotonic() - self._flushed >= self.flush_interval:
+                self._flush()
+        return vectors
+
+    def put_many(self, model, texts, vectors):
+        """Store the vectors of texts, then evict down to max_bytes."""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((model, text_hash(text), blob, len(blob), now))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._flush()
+            self._evict()
+
+    def _flush(self):
+        """Write the buffered last_used times and counters (with the lock held), in one commit."""
+        self._db.executemany(
+            "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE model = ? AND text_hash = ?",
+            [(used, model, h) for (model, h), used in self._last_used.items()],
+        )
+        self._db.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, value) for name, value in self._counts.items() if value],
+        )
+        self._db.commit()
+        self._last_used.clear()
+        self._counts = {"hits": 0, "misses": 0}
+        self._flushed = time.monotonic()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        to_delete = []
+        for model, h, size in self._db.execute("SELECT model, text_hash, size FROM embeddings ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((model, h))
+            total -= size
+        self._db.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", to_delete)
+        self._db.commit()
+        print(f"[INFO] Embedding cache: evicted {len(to_delete)} least recently used entries")
+
+    def counters(self):
+        """Session and lifetime hit/miss counts."""
+        with self._lock:
+            lifetime = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            pending = dict(self._counts)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": lifetime.get("hits", 0) + pending["hits"],
+            "total_misses": lifetime.get("misses", 0) + pending["misses"],
+        }
+
+    def report(self):
+        counts = self.counters()
+        lookups = counts["hits"] + counts["misses"]
+        total_lookups = counts["total_hits"] + counts["total_misses"]
+        print(
+            f"[INFO] Embedding cache: {counts['hits']}/{lookups} hits "
+            f"({counts['hits'] / lookups if lookups else 0:.0%}), "
+            f"lifetime {counts['total_hits'] / total_lookups if total_lookups else 0:.0%} of {total_lookups}"
+        )
+
+    def close(self):
+        """Write the buffered updates and close the database; closing again does nothing."""
+        with self._lock:
+            if self._db is None:
+                return
+            self._flush()
+            self._db.close()
+            self._db = None
+        atexit.unregister(self.close)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that consult an EmbeddingCache before calling the wrapped embeddings."""
+
+    def __init__(self, embeddings, cache, model=EMBED_MODEL):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors = self.cache.get_many(self.model, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Embed each distinct missing text once
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            embedded = dict(zip(missing_texts, self.embeddings.embed_documents(missing_texts)))
+            self.cache.put_many(self.model, missing_texts, [embedded[text] for text in missing_texts])
+            for i in missing:
+                vectors[i] = embedded[texts[i]]
+        self.cache.report()
+        return vectors
+
+    def embed_query(self, text):
+        vector = self.cache.get_many(self.model, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model, [text], [vector])
+        return vector
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def cached_client(base_url=None, cache_path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES, **client_kwargs):
+    """An OllamaEmbedClient behind the on-disk embedding cache.
+
+    One instance per process and set of arguments, created on first use, so
+    every caller shares its HTTP connections and cache database connection.
+    """
+    key = (base_url, os.path.abspath(cache_path), max_bytes, repr(sorted(client_kwargs.items())))
+    with _clients_lock:
+        embeddings = _clients.get(key)
+        if embeddings is None:
+            client = OllamaEmbedClient(base_url=base_url, **client_kwargs)
+            embeddings = _clients[key] = CachedEmbeddings(client, EmbeddingCache(cache_path, max_bytes), client.model)
+        return embeddings
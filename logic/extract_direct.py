@@ -0,0 +1,167 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+from extractfitz import FITZ_VERSION, clear_folder
+from extractplumber import PLUMBER_VERSION, table_to_text
+from isolate_pdf import element_clip_rect, tables_by_page
+from manifest import StageManifest, file_hash, json_hash
+from table_engine import TableStats, extract_table_rows
+
+
+def extract_page_tables(pdf_file, page_tables, margin_px=20, engine="auto"):
+    """Extract the tables of a list of (page_num, Table elements) from one open source document.
+
+    pdfplumber is only opened when a table needs the fallback engine.
+    """
+    fitz_tables = {}
+    plumber_tables = {}
+    no_table_count = 0
+    stats = TableStats()
+    plumber = {}
+
+    def plumber_crop(page_num, rect):
+        if "pdf" not in plumber:
+            plumber["pdf"] = pdfplumber.open(pdf_file)
+        if plumber.get("page_num") != page_num:
+            plumber["page"] = plumber["pdf"].pages[page_num - 1]
+            plumber["page_num"] = page_num
+        return plumber["page"].within_bbox((rect.x0, rect.y0, rect.x1, rect.y1))
+
+    try:
+        with fitz.open(pdf_file) as doc:
+            for page_num, tables in page_tables:
+                page = doc.load_page(page_num - 1)
+                for element in tables:
+                    element_id = element["element_id"]
+                    rect = element_clip_rect(page, element, margin_px)
+                    fitz_tables[element_id] = page.get_text("text", clip=rect).strip()
+
+                    try:
+                        table, _ = stats.timed(
+                            extract_table_rows, page, lambda: plumber_crop(page_num, rect), clip=rect, engine=engine
+                        )
+                        if table:
+                            plumber_tables[element_id] = table_to_text(table)
+                        else:
+                            no_table_count += 1
+                    except Exception as e:
+                        print(f"  Error processing {element_id}: {e}")
+                if plumber.get("page_num") == page_num:
+                    plumber["page"].close()  # Release the page's cached objects
+    finally:
+        if "pdf" in plumber:
+            plumber["pdf"].close()
+
+    return fitz_tables, plumber_tables, no_table_count, stats.seconds
+
+
+def extract_tables_direct(pdf_file, elements, margin_px=20, workers=1, engine="auto"):
+    """Extract each Table element straight from its source page, without clip PDFs.
+
+    The clip rectangle is the one isolate_pdf would cut. PyMuPDF reads the text
+    inside it and the table engine (find_tables, pdfplumber as fallback)
+    extracts the main table from the same area.
+    With workers > 1 the pages are spread over a process pool.
+    Returns ({element_id: fitz text}, {element_id: plumber table text}).
+    """
+    page_tables = list(tables_by_page(elements).items())
+
+    if workers > 1 and len(page_tables) > 1:
+        batches = [page_tables[i::workers] for i in range(workers) if page_tables[i::workers]]
+        # Spawned rather than forked: the host process (Streamlit) runs threads
+        with ProcessPoolExecutor(max_workers=len(batches), mp_context=multiprocessing.get_context("spawn")) as pool:
+            n = len(batches)
+            outcomes = list(pool.map(extract_page_tables, [pdf_file] * n, batches, [margin_px] * n, [engine] * n))
+    else:
+        outcomes = [extract_page_tables(pdf_file, page_tables, margin_px, engine)]
+
+    # Merge back in document order
+    fitz_by_id = {}
+    plumber_by_id = {}
+    no_table_count = 0
+    stats = TableStats()
+    for fitz_part, plumber_part, no_table_part, seconds_part in outcomes:
+        fitz_by_id.update(fitz_part)
+        plumber_by_id.update(plumber_part)
+        no_table_count += no_table_part
+        for used, seconds in seconds_part.items():
+            stats.seconds[used].extend(seconds)
+
+    order = [element["element_id"] for _, tables in page_tables for element in tables]
+    fitz_tables = {element_id: fitz_by_id[element_id] for element_id in order if element_id in fitz_by_id}
+    plumber_tables = {element_id: plumber_by_id[element_id] for element_id in order if element_id in plumber_by_id}
+
+    stats.report()
+    print(f"[OK] Direct extraction completed: {len(fitz_tables)} fitz texts, {len(plumber_tables)} plumber tables; {no_table_count} zones without tables.")
+    return fitz_tables, plumber_tables
+
+
+def write_tables(tables, manifest, keys, element_ids):
+    """Write the {element_id: text} outputs of element_ids, one .txt file each, and record them.
+
+    Elements missing from tables (no table found) are recorded without an
+    output, and a file left by a previous run is deleted so merging skips it.
+    """
+    for element_id in element_ids:
+        path = manifest.output_path(element_id)
+        if element_id in tables:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(tables[element_id])
+            manifest.done(element_id, keys[element_id])
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            manifest.done(element_id, keys[element_id], output=False)
+
+
+def extract_direct(pdf_file, json_cleaned, fitz_folder, plumber_folder, margin_px=20, force=False, engine="auto"):
+    """File-based direct mode: replaces isolate_pdf + extract_fitz + extract_plumber.
+
+    Like extraction.extract_tables, each output folder has a StageManifest:
+    only tables whose source PDF, element or extractor version changed are
+    extracted again, outputs of tables that are gone are deleted, and force
+    re-extracts everything.
+    """
+    with open(json_cleaned + ".json", "r", encoding="utf-8") as f:
+        elements = json.load(f)
+
+    pdf_hash = file_hash(pdf_file + ".pdf")
+    tables = [element for page_tables in tables_by_page(elements).values() for element in page_tables]
+    input_hashes = {element["element_id"]: json_hash([pdf_hash, element, margin_px]) for element in tables}
+
+    manifests = {}
+    keys = {}
+    todo = {}
+    for name, folder, version in (
+        ("fitz", fitz_folder, FITZ_VERSION),
+        ("plumber", plumber_folder, f"{PLUMBER_VERSION}-{engine}"),
+    ):
+        os.makedirs(folder, exist_ok=True)
+        if force:
+            clear_folder(folder)
+        manifests[name] = StageManifest(folder, ".txt", force)
+        keys[name] = {element_id: {"input_hash": h, "version": version} for element_id, h in input_hashes.items()}
+        todo[name] = manifests[name].plan(keys[name])
+
+    todo_ids = set(todo["fitz"]) | set(todo["plumber"])
+    if todo_ids:
+        changed = [element for element in tables if element["element_id"] in todo_ids]
+        fitz_tables, plumber_tables = extract_tables_direct(pdf_file + ".pdf", changed, margin_px, engine=engine)
+        write_tables(fitz_tables, manifests["fitz"], keys["fitz"], todo["fitz"])
+        write_tables(plumber_tables, manifests["plumber"], keys["plumber"], todo["plumber"])
+    for manifest in manifests.values():
+        manifest.save()
+
+
+if __name__ == "__main__":
+    extract_direct(
+        "inputs/file_example",
+        "inputs/file_example-partitioned-cleaned",
+        "inputs/extracts/fitz",
+        "inputs/extracts/plumber",
+    )
@@ -1,6 +1,14 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+
 import fitz  # PyMuPDF
 
+from manifest import StageManifest, clip_inputs
+
+# Part of every output's manifest key, so a new PyMuPDF or extraction change re-extracts
+FITZ_VERSION = f"pymupdf-{fitz.VersionBind}-1"
+
 def clear_folder(folder):
     """Delete all files in a given folder."""
     if not os.path.exists(folder):
@@ -19,38 +27,66 @@ def clear_folder(folder):
     print(f"[OK] {count} files deleted.")
 
 
-def extract_fitz(input_folder, output_folder):
-    """Extract text from the first page of each PDF in input_folder using PyMuPDF (fitz)."""
-    os.makedirs(output_folder, exist_ok=True)
-    clear_folder(output_folder)
-
-    extracted_count = 0
-    error_count = 0
+def fitz_text(pdf_path):
+    """Text of the first page of a PDF, or None if it cannot be read."""
+    try:
+        with fitz.open(pdf_path) as doc:
+            return doc[0].get_text("text").strip()  # first page
+    except Exception:
+        return None
 
-    for filename in os.listdir(input_folder):
-        if not filename.lower().endswith(".pdf"):
-            continue
 
-        pdf_path = os.path.join(input_folder, filename)
-        try:
-            doc = fitz.open(pdf_path)
-            page = doc[0]  # first page
-            content_text = page.get_text("text").strip()
+def extract_fitz(input_folder, output_folder, workers=1, force=False):
+    """Extract text from the first page of each PDF in input_folder using PyMuPDF (fitz).
 
-            output_name = os.path.splitext(filename)[0] + ".txt"
-            output_path = os.path.join(output_folder, output_name)
+    Only clips that are new or changed since the last run are extracted (see
+    StageManifest); force re-extracts everything. With workers > 1 the files are
+    spread over a process pool. Returns {element_id: text}.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    if force:
+        clear_folder(output_folder)
+    manifest = StageManifest(output_folder, ".txt", force)
 
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(content_text)
+    wanted = {element_id: {"input_hash": h, "version": FITZ_VERSION} for element_id, h in clip_inputs(input_folder).items()}
+    todo = manifest.plan(wanted)
+    todo_set = set(todo)
+    paths = [os.path.join(input_folder, f"{element_id}.pdf") for element_id in todo]
 
-            extracted_count += 1
+    if workers > 1 and len(paths) > 1:
+        # Spawned rather than forked: the host process (Streamlit) runs threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            contents = list(pool.map(fitz_text, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        contents = [fitz_text(path) for path in paths]
 
-        except Exception as e:
-            # print(f"[ERROR] Failed with {filename}: {e}")
+    results = manifest.read_outputs(element_id for element_id in wanted if element_id not in todo_set)
+    extracted_count = 0
+    error_count = 0
+    for element_id, content_text in zip(todo, contents):
+        if content_text is None:
             error_count += 1
+            continue
+        with open(manifest.output_path(element_id), "w", encoding="utf-8") as f:
+            f.write(content_text)
+        manifest.done(element_id, wanted[element_id])
+        results[element_id] = content_text
+        extracted_count += 1
+
+    manifest.save()
+    print(f"[OK] Fitz extraction completed. Extracted: {extracted_count} | Unchanged: {len(wanted) - len(todo)} | Errors: {error_count}")
+    return results
+
 
-    print(f"[OK] Fitz extraction completed. Extracted: {extracted_count} | Errors: {error_count}")
+def extract_fitz_clips(clip_pdf, element_ids):
+    """Extract the text of each page of an in-memory clip PDF, keyed by element_id."""
+    results = {}
+    with fitz.open(stream=clip_pdf, filetype="pdf") as doc:
+        for element_id, page in zip(element_ids, doc):
+            results[element_id] = page.get_text("text").strip()
 
+    print(f"[OK] Fitz extraction completed. Extracted: {len(results)}")
+    return results
 
 
 if __name__ == "__main__":
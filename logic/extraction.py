@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from extractfitz import FITZ_VERSION, clear_folder, fitz_text
+from extractplumber import PLUMBER_VERSION, plumber_table
+from manifest import StageManifest, clip_inputs
+from table_engine import TableStats
+
+
+def extract_tables(input_folder, fitz_folder, plumber_folder, workers=None, force=False, engine="auto"):
+    """Run the fitz and plumber extractors at the same time over one process pool.
+
+    Only clips that are new or changed since the last run are extracted, per
+    extractor manifest; force re-extracts everything. Plumber tasks are queued
+    first since they are the slow ones; fitz tasks fill the remaining workers.
+    engine picks the table engine of the plumber extractor (see extract_table_rows).
+    Returns {element_id: {"fitz": text, "plumber": text}}.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    inputs = clip_inputs(input_folder)
+    manifests = {}
+    wanted = {}
+    todo = {}
+    for name, folder, version in (("fitz", fitz_folder, FITZ_VERSION), ("plumber", plumber_folder, PLUMBER_VERSION)):
+        os.makedirs(folder, exist_ok=True)
+        if force:
+            clear_folder(folder)
+        manifests[name] = StageManifest(folder, ".txt", force)
+        wanted[name] = {element_id: {"input_hash": h, "version": version} for element_id, h in inputs.items()}
+        todo[name] = manifests[name].plan(wanted[name])
+
+    def clip_paths(element_ids):
+        return [os.path.join(input_folder, f"{element_id}.pdf") for element_id in element_ids]
+
+    results = {element_id: {} for element_id in inputs}
+    for name in ("fitz", "plumber"):
+        todo_set = set(todo[name])
+        unchanged = manifests[name].read_outputs(element_id for element_id in inputs if element_id not in todo_set)
+        for element_id, content in unchanged.items():
+            results[element_id][name] = content
+
+    # Workers are spawned rather than forked since the host process (Streamlit) runs
+    # threads; no pool at all when every clip is unchanged
+    tasks = len(todo["fitz"]) + len(todo["plumber"])
+    workers = min(workers, tasks) or 1
+    pool_context = (
+        ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if tasks else nullcontext()
+    )
+    with pool_context as pool:
+        chunksize = max(1, tasks // (workers * 8))
+        plumber_paths = clip_paths(todo["plumber"])
+        plumber_outcomes = pool.map(plumber_table, plumber_paths, [engine] * len(plumber_paths), chunksize=chunksize) if pool else []
+        fitz_contents = pool.map(fitz_text, clip_paths(todo["fitz"]), chunksize=chunksize) if pool else []
+
+        fitz_errors = 0
+        for element_id, content in zip(todo["fitz"], fitz_contents):
+            if content is None:
+                fitz_errors += 1
+                continue
+            with open(manifests["fitz"].output_path(element_id), "w", encoding="utf-8") as f:
+                f.write(content)
+            manifests["fitz"].done(element_id, wanted["fitz"][element_id])
+            results[element_id]["fitz"] = content
+
+        no_table_count = 0
+        plumber_errors = 0
+        stats = TableStats()
+        for element_id, (content, error, used, seconds) in zip(todo["plumber"], plumber_outcomes):
+            stats.add(used, seconds)
+            print(f"  {element_id}: {used} in {seconds * 1000:.0f} ms")
+            if error:
+                print(f"  Error processing {element_id}.pdf: {error}")
+                plumber_errors += 1
+                continue
+            if not content:
+                manifests["plumber"].done(element_id, wanted["plumber"][element_id], output=False)
+                no_table_count += 1
+                continue
+            with open(manifests["plumber"].output_path(element_id), "w", encoding="utf-8") as f:
+                f.write(content)
+            manifests["plumber"].done(element_id, wanted["plumber"][element_id])
+            results[element_id]["plumber"] = content
+
+    for manifest in manifests.values():
+        manifest.save()
+    stats.report()
+
+    print(f"[OK] Fitz extraction completed. Extracted: {len(todo['fitz']) - fitz_errors} | Unchanged: {len(inputs) - len(todo['fitz'])} | Errors: {fitz_errors}")
+    print(f"[OK] PdfPlumber extraction completed: {len(todo['plumber']) - no_table_count - plumber_errors} tables extracted; {no_table_count} files without tables; {len(inputs) - len(todo['plumber'])} unchanged.")
+    print(f"[OK] Table extraction finished in {time.perf_counter() - start:.1f}s with {workers} workers.")
+    return results
+
+
+if __name__ == "__main__":
+    extract_tables("inputs/extracts/pdf", "inputs/extracts/fitz", "inputs/extracts/plumber")
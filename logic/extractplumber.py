@@ -1,6 +1,18 @@
+import io
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
 import pdfplumber
 
+from manifest import StageManifest, clip_inputs
+from table_engine import TableStats, extract_table_rows
+
+# Part of every output's manifest key, so a new pdfplumber or extraction change re-extracts
+PLUMBER_VERSION = f"pdfplumber-{pdfplumber.__version__}-pymupdf-{fitz.VersionBind}-2"
+
 
 def clear_folder(folder):
     """Delete all files in a given folder."""
@@ -23,52 +35,120 @@ def clear_folder(folder):
     print(f"[OK] {deleted_count} files deleted.")
 
 
-def extract_plumber(input_folder, output_folder):
-    """Extract the first table from each PDF using pdfplumber."""
+def table_to_text(table):
+    """Render an extracted table as lines of cells joined by " | "."""
+    lines = []
+    for row in table:
+        line = " | ".join(cell or "" for cell in row)
+        lines.append(line)
+    return "\n".join(lines)
 
-    os.makedirs(output_folder, exist_ok=True)
-    clear_folder(output_folder)
 
-    extracted_count = 0
-    no_table_count = 0
+def plumber_table(pdf_path, engine="auto"):
+    """Extract the main table of a PDF's first page (see extract_table_rows).
 
-    for filename in os.listdir(input_folder):
-        if not filename.lower().endswith(".pdf"):
-            continue
+    Returns (content, error, engine used, seconds): content is "" when no table is found.
+    """
+    start = time.perf_counter()
+    plumber_pdf = None
 
-        pdf_path = os.path.join(input_folder, filename)
+    def open_crop():
+        nonlocal plumber_pdf
+        plumber_pdf = pdfplumber.open(pdf_path)
+        page = plumber_pdf.pages[0]
+        return page.within_bbox(page.bbox)
 
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                page = pdf.pages[0]
-                bbox = page.bbox
-                crop = page.within_bbox(bbox)
-                table = crop.extract_table()
-
-                if not table:
-                    # print(f"  No table detected in {filename}")
-                    no_table_count += 1
-                    continue
+    try:
+        with fitz.open(pdf_path) as doc:
+            table, used = extract_table_rows(doc[0], open_crop, engine=engine)
+    except Exception as e:
+        return None, str(e), engine, time.perf_counter() - start
+    finally:
+        if plumber_pdf is not None:
+            plumber_pdf.close()
 
-                # Prepare the extracted table content
-                lines = []
-                for row in table:
-                    line = " | ".join(cell or "" for cell in row)
-                    lines.append(line)
-                content = "\n".join(lines)
+    seconds = time.perf_counter() - start
+    if not table:
+        return "", None, used, seconds
+    return table_to_text(table), None, used, seconds
 
-                # Save extracted table as text
-                output_path = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}.txt")
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(content)
 
-                extracted_count += 1
+def extract_plumber(input_folder, output_folder, workers=1, force=False, engine="auto"):
+    """Extract the main table from each PDF, with find_tables first and pdfplumber as fallback.
 
+    Only clips that are new or changed since the last run are extracted (see
+    StageManifest); force re-extracts everything. With workers > 1 the files are
+    spread over a process pool. Returns {element_id: table text}.
+    """
 
-        except Exception as e:
-            print(f"  Error processing {filename}: {e}")
+    os.makedirs(output_folder, exist_ok=True)
+    if force:
+        clear_folder(output_folder)
+    manifest = StageManifest(output_folder, ".txt", force)
+
+    wanted = {element_id: {"input_hash": h, "version": PLUMBER_VERSION} for element_id, h in clip_inputs(input_folder).items()}
+    todo = manifest.plan(wanted)
+    todo_set = set(todo)
+    paths = [os.path.join(input_folder, f"{element_id}.pdf") for element_id in todo]
+
+    if workers > 1 and len(paths) > 1:
+        # Spawned rather than forked: the host process (Streamlit) runs threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            outcomes = list(pool.map(plumber_table, paths, [engine] * len(paths), chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        outcomes = [plumber_table(path, engine) for path in paths]
+
+    results = manifest.read_outputs(element_id for element_id in wanted if element_id not in todo_set)
+    extracted_count = 0
+    no_table_count = 0
+    stats = TableStats()
+    for element_id, (content, error, used, seconds) in zip(todo, outcomes):
+        stats.add(used, seconds)
+        print(f"  {element_id}: {used} in {seconds * 1000:.0f} ms")
+        if error:
+            print(f"  Error processing {element_id}.pdf: {error}")
+            continue
+        if not content:
+            # print(f"  No table detected in {element_id}.pdf")
+            manifest.done(element_id, wanted[element_id], output=False)
+            no_table_count += 1
+            continue
 
-    print(f"[OK] PdfPlumber extraction completed: {extracted_count} tables extracted; {no_table_count} files without tables.")
+        # Save extracted table as text
+        with open(manifest.output_path(element_id), "w", encoding="utf-8") as f:
+            f.write(content)
+        manifest.done(element_id, wanted[element_id])
+        results[element_id] = content
+        extracted_count += 1
+
+    manifest.save()
+    stats.report()
+    print(f"[OK] PdfPlumber extraction completed: {extracted_count} tables extracted; {no_table_count} files without tables; {len(wanted) - len(todo)} unchanged.")
+    return results
+
+
+def extract_plumber_clips(clip_pdf, element_ids, engine="auto"):
+    """Extract the main table of each page of an in-memory clip PDF, keyed by element_id."""
+    results = {}
+    no_table_count = 0
+    stats = TableStats()
+
+    with fitz.open(stream=clip_pdf, filetype="pdf") as doc, pdfplumber.open(io.BytesIO(clip_pdf)) as pdf:
+        for element_id, page, plumber_page in zip(element_ids, doc, pdf.pages):
+            try:
+                table, _ = stats.timed(extract_table_rows, page, lambda: plumber_page.within_bbox(plumber_page.bbox), engine=engine)
+                if table:
+                    results[element_id] = table_to_text(table)
+                else:
+                    no_table_count += 1
+            except Exception as e:
+                print(f"  Error processing {element_id}: {e}")
+            finally:
+                plumber_page.close()  # Release the page's cached objects
+
+    stats.report()
+    print(f"[OK] PdfPlumber extraction completed: {len(results)} tables extracted; {no_table_count} clips without tables.")
+    return results
 
 
 if __name__ == "__main__":
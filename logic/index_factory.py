@@ -0,0 +1,147 @@
+import json
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# How Flat, HNSW and IVF-Flat indexes store vectors (IVF-PQ always stores PQ codes)
+STORAGE_CODECS = {"float32": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+META_FILE = "index_meta.json"
+
+HNSW_M = 32
+EF_CONSTRUCTION = 200
+EF_SEARCH = 64
+NPROBE = 16
+PQ_M = 48  # sub-quantizers, reduced to a divisor of the dimension if needed
+PQ_BITS = 8
+TRAIN_POINTS_PER_CENTROID = 64  # faiss warns below 39
+MAX_TRAIN_SAMPLE = 256_000
+
+
+def default_nlist(n):
+    """Number of IVF lists: about 4 * sqrt(n), with enough vectors to train each centroid."""
+    return max(1, min(int(4 * math.sqrt(n)), n // TRAIN_POINTS_PER_CENTROID))
+
+
+def index_params(index_type, n, dimension, **overrides):
+    """Resolve the build and search parameters of an index type for n vectors."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    params = {}
+    if index_type == "hnsw":
+        params = {"m": HNSW_M, "ef_construction": EF_CONSTRUCTION, "ef_search": EF_SEARCH}
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        params = {"nlist": default_nlist(n), "nprobe": NPROBE}
+        if index_type == "ivf_pq":
+            pq_m = overrides.get("pq_m", PQ_M)
+            params["pq_m"] = max(m for m in range(1, pq_m + 1) if dimension % m == 0)
+            params["pq_bits"] = PQ_BITS
+    params.update((key, value) for key, value in overrides.items() if key in params and key != "pq_m")
+    return params
+
+
+def factory_string(index_type, params, storage="float32"):
+    """faiss.index_factory description of an index type storing vectors as storage."""
+    if storage not in STORAGE_CODECS:
+        raise ValueError(f"Unknown storage {storage!r}, expected one of {tuple(STORAGE_CODECS)}")
+    codec = STORAGE_CODECS[storage]
+    if index_type == "hnsw":
+        return f"HNSW{params['m']}" if storage == "float32" else f"HNSW{params['m']},{codec}"
+    if index_type == "ivf_flat":
+        return f"IVF{params['nlist']},{codec}"
+    if index_type == "ivf_pq":
+        return f"IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_bits']}"
+    return codec
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Set the search-time knobs of an index: nprobe (IVF) and efSearch (HNSW)."""
+    space = faiss.ParameterSpace()
+    if nprobe and faiss.try_extract_index_ivf(index) is not None:
+        space.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search and isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        space.set_index_parameter(index, "efSearch", ef_search)
+
+
+def resolve_index_type(index_type, n, pq_bits=PQ_BITS):
+    """Index type build_index builds for n vectors: corpora too small to train a
+    product quantizer get IVF-Flat, and those too small for IVF get Flat."""
+    if index_type == "ivf_pq" and n < TRAIN_POINTS_PER_CENTROID * 2 ** pq_bits:
+        index_type = "ivf_flat"
+    if index_type in ("ivf_flat", "ivf_pq") and n < 2 * TRAIN_POINTS_PER_CENTROID:
+        index_type = "flat"
+    return index_type
+
+
+def resolve_storage(index_type, storage):
+    """Storage recorded for an index: IVF-PQ always stores PQ codes."""
+    return "pq" if index_type == "ivf_pq" else storage
+
+
+def build_index(vectors, index_type="flat", storage="float32", train_sample=None, seed=0, **overrides):
+    """Build a FAISS index (L2) of the given type over an (n, d) array of vectors.
+
+    storage is "float32", "fp16" (half the size) or "sq8" (8-bit scalar
+    quantization, a quarter of the size) for Flat, HNSW and IVF-Flat indexes.
+    Indexes that need training (IVF, sq8) are trained on a random sample of
+    train_sample vectors (by default TRAIN_POINTS_PER_CENTROID per IVF list,
+    plus enough for the PQ codebooks). Corpora too small to train a product quantizer fall back to
+    IVF-Flat, and those too small for IVF to Flat. Returns (index, metadata),
+    the metadata recording the type that was actually built and its parameters.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dimension = vectors.shape
+
+    built_type = resolve_index_type(index_type, n, overrides.get("pq_bits", PQ_BITS))
+    if built_type != index_type:
+        print(f"[INFO] {n} vectors are too few to train {index_type}, building {built_type} instead.")
+        index_type = built_type
+
+    params = index_params(index_type, n, dimension, **overrides)
+    storage = resolve_storage(index_type, storage)
+    factory = factory_string(index_type, params, "float32" if storage == "pq" else storage)
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params["ef_construction"]
+
+    trained_on = 0
+    if not index.is_trained:
+        if train_sample is None:
+            train_sample = TRAIN_POINTS_PER_CENTROID * params.get("nlist", n)
+            if index_type == "ivf_pq":
+                train_sample = max(train_sample, TRAIN_POINTS_PER_CENTROID * 2 ** params["pq_bits"])
+            train_sample = min(train_sample, MAX_TRAIN_SAMPLE)
+        trained_on = min(n, train_sample)
+        sample = np.random.default_rng(seed).choice(n, size=trained_on, replace=False)
+        index.train(vectors[np.sort(sample)])
+
+    index.add(vectors)
+    set_search_params(index, params.get("nprobe"), params.get("ef_search"))
+
+    metadata = {
+        "index_type": index_type,
+        "storage": storage,
+        "factory": factory,
+        "dimension": dimension,
+        "ntotal": index.ntotal,
+        "trained_on": trained_on,
+        "params": params,
+    }
+    return index, metadata
+
+
+def write_index_meta(folder, metadata):
+    with open(os.path.join(folder, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def read_index_meta(folder):
+    """Metadata of a saved index; indexes saved before it was recorded are flat."""
+    path = os.path.join(folder, META_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "storage": "float32", "factory": "Flat", "params": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -1,6 +1,13 @@
 import fitz
 import json
 import os
+from collections import defaultdict
+
+from manifest import StageManifest, json_hash
+from partition_cache import page_fingerprints
+
+# Bump when the clip geometry or output format changes, to invalidate existing clips
+ISOLATE_VERSION = 1
 
 
 def clear_folder(folder):
@@ -30,10 +37,8 @@ def convert_points(points, json_width, json_height, page_width, page_height):
     return converted
 
 
-def extract_pdf_zone(pdf_path, page_num, points, json_width, json_height, output_pdf_path, margin_px=20):
-    """Extract a rectangular zone from a PDF page and save as a new PDF."""
-    doc = fitz.open(pdf_path)
-    page = doc.load_page(page_num - 1)
+def table_clip_rect(page, points, json_width, json_height, margin_px=20):
+    """Compute the clip rectangle of a zone on a PDF page from JSON coordinates."""
     page_rect = page.rect
     page_width = page_rect.width
     page_height = page_rect.height
@@ -54,9 +59,17 @@ def extract_pdf_zone(pdf_path, page_num, points, json_width, json_height, output
     # Ensure rectangle is within page bounds
     if not page_rect.contains(rect):
         rect = rect & page_rect
+    return rect
 
-    # Create new PDF for the extracted zone
-    new_doc = fitz.open()
+
+def element_clip_rect(page, element, margin_px=20):
+    """Clip rectangle of a Table element on its (already loaded) page."""
+    coords = element["metadata"]["coordinates"]
+    return table_clip_rect(page, coords["points"], coords["layout_width"], coords["layout_height"], margin_px)
+
+
+def add_clip_page(new_doc, doc, page_num, rect):
+    """Append a page to new_doc showing only rect of page page_num (1-based) of doc."""
     clip_width = rect.width
     clip_height = rect.height
     new_page = new_doc.new_page(width=clip_width, height=clip_height)
@@ -68,13 +81,94 @@ def extract_pdf_zone(pdf_path, page_num, points, json_width, json_height, output
         clip=rect
     )
 
+
+def extract_pdf_zone(pdf_path, page_num, points, json_width, json_height, output_pdf_path, margin_px=20):
+    """Extract a rectangular zone from a PDF page and save as a new PDF."""
+    doc = fitz.open(pdf_path)
+    page = doc.load_page(page_num - 1)
+    rect = table_clip_rect(page, points, json_width, json_height, margin_px)
+
+    # Create new PDF for the extracted zone
+    new_doc = fitz.open()
+    add_clip_page(new_doc, doc, page_num, rect)
+
     new_doc.save(output_pdf_path)
     new_doc.close()
     doc.close()
     return 1
 
 
-def isolate_pdf(pdf_file, json_cleaned, output_folder):
+def tables_by_page(elements):
+    """Group Table elements by page number, keeping document order."""
+    pages = defaultdict(list)
+    for element in elements:
+        if element["type"] == "Table":
+            pages[element["metadata"]["page_number"]].append(element)
+    return pages
+
+
+def clip_tables(pdf_file, elements):
+    """Clip every Table element into one in-memory PDF, one page per table.
+
+    The source PDF is opened once and each page loaded once for all its tables.
+    Returns the PDF bytes and the element ids in page order.
+    """
+    element_ids = []
+    with fitz.open(pdf_file) as doc, fitz.open() as new_doc:
+        for page_num, tables in tables_by_page(elements).items():
+            page = doc.load_page(page_num - 1)
+            for element in tables:
+                add_clip_page(new_doc, doc, page_num, element_clip_rect(page, element))
+                element_ids.append(element["element_id"])
+        clip_pdf = new_doc.tobytes(garbage=1)
+
+    print(f"[OK] {len(element_ids)} tables clipped in memory.")
+    return clip_pdf, element_ids
+
+
+def isolate_tables(pdf_file, elements, output_folder, margin_px=20, force=False):
+    """Write one clip PDF per Table element of an element list.
+
+    Only clips that are new, or whose geometry or source page changed, are
+    written; clips of tables that disappeared are deleted. force rebuilds all.
+    """
+    if force:
+        clear_folder(output_folder)
+    manifest = StageManifest(output_folder, ".pdf", force)
+
+    page_hashes = page_fingerprints(pdf_file)
+    pages = tables_by_page(elements)
+    wanted = {}
+    for page_num, tables in pages.items():
+        for element in tables:
+            wanted[element["element_id"]] = {
+                "clip_hash": json_hash([element["metadata"]["coordinates"], margin_px]),
+                "source_hash": page_hashes[page_num - 1],
+                "version": ISOLATE_VERSION,
+            }
+    todo = set(manifest.plan(wanted))
+
+    extracted_count = 0
+    with fitz.open(pdf_file) as doc:
+        for page_num, tables in pages.items():
+            if not any(element["element_id"] in todo for element in tables):
+                continue
+            page = doc.load_page(page_num - 1)
+            for element in tables:
+                element_id = element["element_id"]
+                if element_id not in todo:
+                    continue
+                with fitz.open() as new_doc:
+                    add_clip_page(new_doc, doc, page_num, element_clip_rect(page, element, margin_px))
+                    new_doc.save(manifest.output_path(element_id))
+                manifest.done(element_id, wanted[element_id])
+                extracted_count += 1
+
+    manifest.save()
+    print(f"[OK] {extracted_count} isolated PDF extracts created ({len(wanted) - extracted_count} unchanged).")
+
+
+def isolate_pdf(pdf_file, json_cleaned, output_folder, force=False):
     """Isolate all Table elements from a PDF according to JSON coordinates."""
     pdf_file = pdf_file + ".pdf"
     json_cleaned = json_cleaned + ".json"
@@ -82,21 +176,7 @@ def isolate_pdf(pdf_file, json_cleaned, output_folder):
     with open(json_cleaned, "r", encoding="utf-8") as f:
         json_data = json.load(f)
 
-    clear_folder(output_folder)
-
-    extracted_count = 0
-    for element in json_data:
-        if element["type"] == "Table":
-            meta = element["metadata"]
-            coords = meta["coordinates"]["points"]
-            page = meta["page_number"]
-            element_id = element["element_id"]
-            json_w = meta["coordinates"]["layout_width"]
-            json_h = meta["coordinates"]["layout_height"]
-            output_file = os.path.join(output_folder, f"{element_id}.pdf")
-            extracted_count += extract_pdf_zone(pdf_file, page, coords, json_w, json_h, output_file)
-
-    print(f"[OK] {extracted_count} isolated PDF extracts created.")
+    isolate_tables(pdf_file, json_data, output_folder, force=force)
 
 
 if __name__ == "__main__":
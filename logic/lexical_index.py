@@ -0,0 +1,177 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+
+import numpy as np
+
+LEXICAL_FILE = "lexical.npz"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # rank constant of reciprocal-rank fusion
+
+# Words, numbers and codes, keeping "1.5", "m²" or "ab-12/c" whole
+TOKEN_PATTERN = re.compile(r"\w+(?:[.,/-]\w+)*")
+SEPARATORS = re.compile(r"[.,/-]")
+
+
+def tokenize(text):
+    """Lowercase terms of a text; compound tokens ("ab-12") also give their parts ("ab", "12")."""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.casefold()):
+        terms.append(token)
+        if SEPARATORS.search(token):
+            terms.extend(part for part in SEPARATORS.split(token) if part)
+    return terms
+
+
+class TermList(Sequence):
+    """Sorted vocabulary stored as one UTF-8 blob and the byte offsets of each term.
+
+    Each term takes its own length (a fixed-width string array would give
+    every term the length of the longest one); terms are decoded on access,
+    so lookups bisect the list without building a dict.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_terms(cls, terms):
+        encoded = [term.encode("utf-8") for term in terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(term) for term in encoded])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def index_of(self, term):
+        """Position of a term in the vocabulary, None if it is not there."""
+        i = bisect_left(self, term)
+        return i if i < len(self) and self[i] == term else None
+
+
+class LexicalIndex:
+    """BM25 inverted index over the chunks of a store, held in flat numpy arrays.
+
+    terms is the sorted vocabulary (a TermList); the postings of terms[i] are
+    docs[indptr[i]:indptr[i+1]] (chunk numbers) with their term frequencies
+    in tfs. positions maps chunk numbers to the positions of the chunks in
+    the FAISS index, so hits are read from the same docstore.
+    """
+
+    def __init__(self, terms, indptr, docs, tfs, lengths, positions):
+        self.terms = terms
+        self.indptr = indptr
+        self.docs = docs
+        self.tfs = tfs
+        self.lengths = lengths
+        self.positions = positions
+        self.avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                term_blob=self.terms.blob,
+                term_offsets=self.terms.offsets,
+                indptr=self.indptr,
+                docs=self.docs,
+                tfs=self.tfs,
+                lengths=self.lengths,
+                positions=self.positions,
+            )
+
+    def search(self, query, limit=None, k1=BM25_K1, b=BM25_B):
+        """BM25 scores of the chunks matching a query, best first: [(position, score)] of the
+        best limit chunks, or a generator over all matching chunks when limit is None."""
+        n = len(self.positions)
+        term_ids = [self.terms.index_of(term) for term in set(tokenize(query))]
+        term_ids = [term_id for term_id in term_ids if term_id is not None]
+        if n == 0 or not term_ids:
+            return iter(()) if limit is None else []
+
+        scores = np.zeros(n, dtype=np.float32)
+        norms = k1 * (1 - b + b * self.lengths / (self.avg_length or 1.0))
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + norms[docs])
+
+        matches = np.flatnonzero(scores)
+        if limit is not None and limit < len(matches):
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        hits = ((int(self.positions[i]), float(scores[i])) for i in matches)
+        return hits if limit is None else list(hits)
+
+
+def build_lexical_index(positions, texts):
+    """Build the BM25 index of chunk texts, given with their positions in the FAISS index."""
+    postings = defaultdict(list)
+    lengths = []
+    for doc, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings[term].append((doc, tf))
+
+    terms = sorted(postings)
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(postings[term]) for term in terms])
+    pairs = [pair for term in terms for pair in postings[term]]
+    return LexicalIndex(
+        terms=TermList.from_terms(terms),
+        indptr=indptr,
+        docs=np.array([doc for doc, _ in pairs], dtype=np.int32),
+        tfs=np.minimum([tf for _, tf in pairs], np.iinfo(np.uint16).max).astype(np.uint16),
+        lengths=np.array(lengths, dtype=np.int32),
+        positions=np.array(list(positions), dtype=np.int64),
+    )
+
+
+def load_lexical_index(path):
+    """Load a LexicalIndex saved by LexicalIndex.save (plain arrays, no pickle)."""
+    with np.load(path, allow_pickle=False) as arrays:
+        arrays = {name: arrays[name] for name in arrays.files}
+    if "terms" in arrays:  # fixed-width string array of the first format
+        terms = TermList.from_terms(arrays.pop("terms").tolist())
+    else:
+        terms = TermList(arrays.pop("term_blob"), arrays.pop("term_offsets"))
+    return LexicalIndex(terms=terms, **arrays)
+
+
+def rrf_fuse(rankings, key, k=RRF_K):
+    """Merge ranked lists of items by reciprocal-rank fusion: sum of 1 / (k + rank) over the lists.
+
+    key(item) identifies the same item in several lists; the first occurrence
+    is kept. Returns [(item, score)], best first.
+    """
+    scores = {}
+    items = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            item_key = key(item)
+            items.setdefault(item_key, item)
+            scores[item_key] = scores.get(item_key, 0.0) + 1.0 / (k + rank)
+    return [(items[item_key], score) for item_key, score in sorted(scores.items(), key=lambda s: -s[1])]
+
+
+if __name__ == "__main__":
+    index = build_lexical_index(
+        range(3),
+        ["RC (Resin Coated) Paper: 1.5 m²", "Baryta paper, code FB-120", "Surface Area Consumed (m²)"],
+    )
+    for position, score in index.search("RC paper m²"):
+        print(f"[INFO] chunk {position}: {score:.3f}")
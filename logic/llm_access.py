@@ -1,39 +1,81 @@
-from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings, OllamaLLM
+from langchain_ollama import OllamaLLM
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from registry import CORPUS_FOLDER
+from embedding_cache import cached_client
+from retriever import get_retriever
+from vector_store import FUSION_CANDIDATES, fuse_results, lexical_search, load_lexical, load_store, search_store
+
 ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 
+LLM_MODEL = "mistral:7b"
 
-def semantic_search(query: str, vectorstore_folder: str, k: int = 3, debug: bool = False):
+ANSWER_CACHE_SIZE = 256
+ANSWER_CACHE_TTL = 24 * 3600  # seconds
+
+
+def semantic_search(
+    query: str,
+    vectorstore_folder: str,
+    k: int = 3,
+    debug: bool = False,
+    pages=None,
+    nprobe=None,
+    ef_search=None,
+    mode: str = "hybrid"
+):
     """
     Perform a semantic search over the FAISS vectorstore using Ollama embeddings.
+    Query embeddings are looked up in the on-disk embedding cache first.
+    mode="hybrid" fuses the vector results with those of the BM25 index of
+    the store (exact product names, units, codes) by reciprocal-rank fusion;
+    mode="lexical" only uses BM25 and needs no embedding call, mode="vector"
+    only the FAISS index.
+    pages=(first, last) restricts the results to chunks from that page range.
+    nprobe (IVF indexes) and ef_search (HNSW) trade speed for recall; they
+    default to the values the index was built with.
     """
-    embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=ollama_base_url,)
-    db = FAISS.load_local(
-        vectorstore_folder,
-        embeddings,
-        allow_dangerous_deserialization=True
-    )
-    results = db.similarity_search(query, k=k)
+    embeddings = cached_client(base_url=ollama_base_url)
+    # Memory-mapped index, chunk texts read from SQLite only for the hits
+    db, metadata = load_store(vectorstore_folder, embeddings)
+    lexical = load_lexical(vectorstore_folder, metadata["version"]) if mode != "vector" else None
+    if lexical is None and mode != "vector":
+        print(f"[INFO] No lexical index in {vectorstore_folder}, vectorize the chunks again to build it.")
+        mode = "vector"
+
+    # Each ranking brings more candidates than k for the fusion to reorder
+    fetch_k = k if mode == "vector" else FUSION_CANDIDATES * k
+    vector_results = []
+    if mode != "lexical":
+        vector = embeddings.embed_query(query)
+        vector_results = search_store(db, metadata, vector, fetch_k, pages, nprobe, ef_search)
+    lexical_results = lexical_search(db, lexical, query, fetch_k, pages) if mode != "vector" else []
+    results = fuse_results(vector_results, lexical_results, k, mode)
 
     for i, doc in enumerate(results):
         if debug:
-            print(f"[DEBUG] RAG SEM result {i+1} chunk_id={doc.metadata.get('chunk_id', 'unknown')}\n{doc.page_content}")
+            print(
+                f"[DEBUG] RAG SEM result {i+1} chunk_id={doc.metadata.get('chunk_id', 'unknown')} "
+                f"pages={doc.metadata.get('page_start')}-{doc.metadata.get('page_end')}\n{doc.page_content}"
+            )
 
     return results
 
 
-def ask_llm(question: str, retrieved_docs):
+def build_prompt(question: str, retrieved_docs):
     """
-    Ask an LLM (Ollama) a question based on retrieved documents (RAG).
+    RAG prompt: the question followed by the contents of the retrieved chunks.
     """
-    llm_model = "mistral:7b"
-
     # Combine retrieved chunk contents
     raw_context = "\n\n".join([doc.page_content for doc in retrieved_docs])
 
-    prompt = f"""
+    return f"""
 {question}
 
 Give the unique response between brackets: [response] 
@@ -41,29 +83,245 @@ Here is the raw data:
 {raw_context}
 """
 
-    llm = OllamaLLM(model=llm_model,base_url=ollama_base_url)
-    response = llm.invoke(prompt)
+
+def ask_llm(question: str, retrieved_docs):
+    """
+    Ask an LLM (Ollama) a question based on retrieved documents (RAG).
+    """
+    llm = OllamaLLM(model=LLM_MODEL, base_url=ollama_base_url)
+    response = llm.invoke(build_prompt(question, retrieved_docs))
     return response
 
 
-def access_llm(question_llm: str, query_semantic: str, debug: bool = False):
+def stream_llm(question: str, retrieved_docs, metrics=None, start=None):
+    """
+    Streaming variant of ask_llm: yields the response piece by piece as Ollama
+    generates it (one token per piece).
+    Once the response is complete, metrics (a dict) receives "ttft" (seconds
+    from start, by default the call, to the first token), "tokens",
+    "generation" (seconds) and "tokens_per_second" (after the first token).
+    """
+    metrics = {} if metrics is None else metrics
+    start = start or time.perf_counter()
+    llm = OllamaLLM(model=LLM_MODEL, base_url=ollama_base_url)
+
+    first_token = None
+    tokens = 0
+    for token in llm.stream(build_prompt(question, retrieved_docs)):
+        if first_token is None:
+            first_token = time.perf_counter()
+        tokens += 1
+        yield token
+
+    end = time.perf_counter()
+    first_token = first_token or end
+    metrics.update(
+        ttft=first_token - start,
+        tokens=tokens,
+        generation=end - start,
+        tokens_per_second=(tokens - 1) / (end - first_token) if tokens > 1 and end > first_token else 0.0,
+    )
+
+
+class AnswerCache:
+    """Thread-safe LRU of LLM answers, for questions asked again on the same chunks.
+
+    An answer is keyed by the normalized question, the retrieved chunks (doc
+    id, chunk id and index version of each, in prompt order) and the model,
+    so it is only reused for the exact same prompt. With similarity set (a
+    cosine between 0 and 1), a question whose embedding is at least that
+    close to a cached one on the same chunks and model reuses its answer too.
+    Answers expire after ttl seconds, at most max_entries are kept, and
+    those of a document are dropped as soon as a newer version of its index
+    is seen.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, similarity=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # (question, context, model) -> (question vector, answer, time)
+        self._versions = {}  # doc_id -> newest index version seen
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question, retrieved_docs, model=LLM_MODEL):
+        context = tuple(
+            (doc.metadata.get("doc_id"), doc.metadata.get("chunk_id"), doc.metadata.get("index_version"))
+            for doc in retrieved_docs
+        )
+        return " ".join(question.split()).casefold(), context, model
+
+    def _check_versions(self, context):
+        """Drop the answers of documents whose index changed; False if context is from an older version."""
+        current = True
+        for doc_id, _, version in context:
+            known = self._versions.get(doc_id)
+            if version is None or version == known:
+                continue
+            if known is not None and version < known:  # v<nanoseconds>: searched just before a reload
+                current = False
+                continue
+            self._versions[doc_id] = version
+            if known is not None:
+                stale = [key for key in self._entries if any(entry[0] == doc_id for entry in key[1])]
+                for key in stale:
+                    del self._entries[key]
+        return current
+
+    def get(self, key, vector=None):
+        """Cached answer for key (or a similar question when vector is given), None on a miss."""
+        now = time.time()
+        with self._lock:
+            self._check_versions(key[1])
+            expired = [k for k, (_, _, created) in self._entries.items() if now - created > self.ttl]
+            for k in expired:
+                del self._entries[k]
+
+            found = key if key in self._entries else None
+            if found is None and self.similarity is not None and vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+                best = self.similarity
+                for k, (cached_vector, _, _) in self._entries.items():
+                    if k[1:] != key[1:] or cached_vector is None:
+                        continue
+                    cosine = float(vector @ cached_vector) / (
+                        float(np.linalg.norm(vector) * np.linalg.norm(cached_vector)) or 1.0
+                    )
+                    if cosine >= best:
+                        found, best = k, cosine
+
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(found)
+            self.hits += 1
+            return self._entries[found][1]
+
+    def put(self, key, answer, vector=None):
+        with self._lock:
+            if not self._check_versions(key[1]):
+                return  # already superseded
+            if vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+            self._entries[key] = (vector, answer, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide answer cache of access_llm and access_llm_stream
+answer_cache = AnswerCache()
+
+
+def cached_answer(cache, retriever, question, retrieved_docs):
+    """Look a question up in an answer cache; returns (key, question vector, answer or None)."""
+    if cache is None:
+        return None, None, None
+    key = AnswerCache.key(question, retrieved_docs, LLM_MODEL)
+    # The question is only embedded (through the retriever's query LRU) for near-duplicate matching
+    vector = retriever.embed_query(question) if cache.similarity is not None else None
+    return key, vector, cache.get(key, vector)
+
+
+def access_llm(
+    question_llm: str,
+    query_semantic: str,
+    debug: bool = False,
+    pages=None,
+    doc_ids=None,
+    corpus_folder: str = CORPUS_FOLDER,
+    cache=answer_cache,
+    mode: str = "hybrid"
+):
     """
     High-level function to perform semantic search and ask the LLM.
+    The search covers every document of the corpus, or only doc_ids, through
+    the process-wide retriever (shards loaded once, reloaded when they change).
+    mode selects hybrid, vector or lexical retrieval (see semantic_search).
+    The answer is reused from cache when the same question was asked on the
+    same chunks (see AnswerCache); cache=None always asks the LLM.
     """
-    vectorstore_folder = "inputs/vectorstore"
-    retrieved_docs = semantic_search(query_semantic, vectorstore_folder, debug=debug)
-    response = ask_llm(question_llm, retrieved_docs)
+    retriever = get_retriever(corpus_folder)
+    retrieved_docs = retriever.search(query_semantic, doc_ids=doc_ids, pages=pages, debug=debug, mode=mode)
+    key, vector, response = cached_answer(cache, retriever, question_llm, retrieved_docs)
+    if response is None:
+        response = ask_llm(question_llm, retrieved_docs)
+        if cache is not None:
+            cache.put(key, response, vector)
 
     if debug:
         print(f"[INFO] LLM question: {question_llm}\n[INFO] LLM response: {response}")
+        if cache is not None:
+            print(f"[DEBUG] Answer cache: {cache.hits} hits / {cache.misses} misses")
 
     return response
 
 
+def access_llm_stream(
+    question_llm: str,
+    query_semantic: str,
+    debug: bool = False,
+    pages=None,
+    doc_ids=None,
+    corpus_folder: str = CORPUS_FOLDER,
+    metrics=None,
+    cache=answer_cache,
+    mode: str = "hybrid"
+):
+    """
+    Streaming variant of access_llm: searches right away, then returns a
+    generator of the response tokens (see stream_llm).
+    metrics (a dict) receives "retrieval" (seconds) now and the generation
+    metrics of stream_llm once the response is complete; "ttft" counts from
+    the start of the search, as seen by the user. "cached" tells whether the
+    answer came from cache, in which case it is yielded in one piece.
+    """
+    metrics = {} if metrics is None else metrics
+    start = time.perf_counter()
+    retriever = get_retriever(corpus_folder)
+    retrieved_docs = retriever.search(query_semantic, doc_ids=doc_ids, pages=pages, debug=debug, mode=mode)
+    key, vector, cached = cached_answer(cache, retriever, question_llm, retrieved_docs)
+    metrics["retrieval"] = time.perf_counter() - start
+    metrics["cached"] = cached is not None
+
+    def tokens():
+        if cached is not None:
+            yield cached
+            elapsed = time.perf_counter() - start
+            metrics.update(ttft=elapsed, tokens=0, generation=elapsed, tokens_per_second=0.0)
+            response = [cached]
+        else:
+            response = []
+            for token in stream_llm(question_llm, retrieved_docs, metrics, start):
+                response.append(token)
+                yield token
+            # Only complete answers are cached: an abandoned stream stops at the last yield
+            if cache is not None:
+                cache.put(key, "".join(response), vector)
+        if debug:
+            print(f"[INFO] LLM question: {question_llm}\n[INFO] LLM response: {''.join(response)}")
+            print(
+                f"[INFO] LLM metrics: retrieval {metrics['retrieval']:.2f}s, first token {metrics['ttft']:.2f}s, "
+                f"{metrics['tokens']} tokens at {metrics['tokens_per_second']:.1f} tokens/s"
+                + (", cached answer" if metrics["cached"] else "")
+            )
+
+    return tokens()
+
 
 if __name__ == "__main__":
     question_llm = "What is the Surface Area Consumed (m²) of RC (Resin Coated) Paper?"
     query_semantic = "RC (Resin Coated) Paper"
 
-    answer = access_llm(question_llm, query_semantic)
-    print(answer)
+    metrics = {}
+    for token in access_llm_stream(question_llm, query_semantic, metrics=metrics):
+        print(token, end="", flush=True)
+    print(f"\n[INFO] First token after {metrics['ttft']:.2f}s, {metrics['tokens_per_second']:.1f} tokens/s")
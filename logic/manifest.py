@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_hash(path):
+    """SHA-256 of a file's content."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def json_hash(value):
+    """SHA-256 of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def clip_inputs(input_folder):
+    """Map element_id -> content hash for the clip PDFs of a folder."""
+    return {
+        os.path.splitext(filename)[0]: file_hash(os.path.join(input_folder, filename))
+        for filename in sorted(os.listdir(input_folder))
+        if filename.lower().endswith(".pdf")
+    }
+
+
+class StageManifest:
+    """Record of which element outputs of a stage folder are up to date.
+
+    Each entry holds the key an output was computed from (input hashes and
+    stage version). Only entries whose key changed are recomputed, and outputs
+    of elements that are gone are deleted.
+    """
+
+    def __init__(self, folder, output_ext, force=False):
+        self.folder = folder
+        self.output_ext = output_ext
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        os.makedirs(folder, exist_ok=True)
+
+        self.entries = {}
+        if not force and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] Unreadable manifest {self.path}, rebuilding: {e}")
+
+    def output_path(self, element_id):
+        return os.path.join(self.folder, f"{element_id}{self.output_ext}")
+
+    def plan(self, wanted):
+        """Return the element ids of wanted ({element_id: key}) that must be recomputed.
+
+        Outputs (and entries) of elements that are no longer wanted are deleted.
+        """
+        stale_count = 0
+        for filename in os.listdir(self.folder):
+            element_id, ext = os.path.splitext(filename)
+            if ext == self.output_ext and element_id not in wanted:
+                try:
+                    os.remove(os.path.join(self.folder, filename))
+                    stale_count += 1
+                except OSError as e:
+                    print(f"[ERROR] Failed to delete {filename}: {e}")
+        for element_id in list(self.entries):
+            if element_id not in wanted:
+                del self.entries[element_id]
+
+        todo = []
+        for element_id, key in wanted.items():
+            entry = self.entries.get(element_id)
+            up_to_date = (
+                entry is not None
+                and all(entry.get(k) == v for k, v in key.items())
+                and (not entry.get("output", True) or os.path.exists(self.output_path(element_id)))
+            )
+            if not up_to_date:
+                self.entries.pop(element_id, None)
+                todo.append(element_id)
+
+        print(f"[INFO] {self.folder}: {len(todo)} to compute, {len(wanted) - len(todo)} up to date, {stale_count} stale outputs deleted.")
+        return todo
+
+    def done(self, element_id, key, output=True):
+        """Record that element_id was computed from key (output=False when it produced no file)."""
+        self.entries[element_id] = dict(key, output=output)
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def read_outputs(self, element_ids):
+        """Read back the text outputs of element ids that have one."""
+        outputs = {}
+        for element_id in element_ids:
+            if self.entries.get(element_id, {}).get("output", True):
+                try:
+                    with open(self.output_path(element_id), "r", encoding="utf-8") as f:
+                        outputs[element_id] = f.read()
+                except OSError:
+                    pass
+        return outputs
@@ -1,10 +1,18 @@
 import json
 import os
-from collections import defaultdict
+from collections import Counter, defaultdict
 
+from artifacts import write_jsonl
+from table_selection import select_table
+
+SECTION_SEPARATOR = "-------------------------------------------------------------"
+
+
+def load_table(element_id, folder, missing="[Table missing]"):
+    """Load the content of a table by element_id, from a folder of .txt files or an in-memory dict."""
+    if isinstance(folder, dict):
+        return folder[element_id].strip() if element_id in folder else missing
 
-def load_table(element_id, folder):
-    """Load the content of a table file by element_id."""
     path = os.path.join(folder, f"{element_id}.txt")
     if os.path.exists(path):
         try:
@@ -13,7 +21,7 @@ def load_table(element_id, folder):
         except Exception as e:
             print(f"[ERROR] Failed to read {path}: {e}")
             return "[Error loading table]"
-    return "[Table missing]"
+    return missing
 
 
 def is_title(element):
@@ -21,15 +29,80 @@ def is_title(element):
     return element.get("type") == "Title"
 
 
-def reconstruct_document(plumber_folder, fitz_folder, json_path):
-    """Reconstruct a full document from elements and associated tables."""
-    json_path += ".json"
-
-    with open(json_path, 'r', encoding='utf-8') as f:
-        elements = json.load(f)
-
-    final_text = []
+def table_block(element, plumber_folder, fitz_folder, tables="best", sources=None):
+    """Lines of one table: its selected representation, or both extractions with tables="both"."""
+    element_id = element["element_id"]
+    if tables == "both":
+        plumber_content = load_table(element_id, plumber_folder)
+        fitz_content = load_table(element_id, fitz_folder)
+        return [
+            f"Table {element_id} (plumber version):\n{plumber_content}\n",
+            f"Table {element_id} (fitz version):\n{fitz_content}\n",
+            f"End of Table {element_id} (fitz version)",
+        ]
+
+    source, content = select_table(
+        load_table(element_id, plumber_folder, missing=""),
+        load_table(element_id, fitz_folder, missing=""),
+        element.get("text", ""),
+    )
+    if sources is not None:
+        sources[source] += 1
+    return [f"Table {element_id} ({source} version):\n{content}\n", f"End of Table {element_id}"]
+
+
+class SectionBuilder:
+    """Collect element lines into sections, cut where the reconstructed text has separator lines."""
+
+    def __init__(self):
+        self.title = None
+        self._reset()
+
+    def _reset(self):
+        self.lines = []
+        self.table_id = None
+        self.pages = []
+        self.element_ids = []
+
+    def add(self, element, lines, table_id=None):
+        self.lines.extend(lines)
+        self.element_ids.append(element["element_id"])
+        page = element.get("metadata", {}).get("page_number")
+        if page is not None:
+            self.pages.append(page)
+        if table_id:
+            self.table_id = table_id
+
+    def cut(self):
+        """Return the current section (as a list of zero or one record) and start a new one."""
+        text = "\n".join(self.lines).strip()
+        sections = []
+        if text:
+            sections.append({
+                "title": self.title,
+                "text": text,
+                "table_id": self.table_id,
+                "page_start": min(self.pages) if self.pages else None,
+                "page_end": max(self.pages) if self.pages else None,
+                "element_ids": self.element_ids,
+            })
+        self._reset()
+        return sections
+
+
+def iter_sections(elements, plumber_folder, fitz_folder, tables="best"):
+    """Yield the document as sections in reading order.
+
+    A section is {"title", "text", "table_id", "page_start", "page_end",
+    "element_ids"}: title is the heading it falls under and table_id the table
+    it holds, if any. plumber_folder and fitz_folder may also be
+    {element_id: text} dicts. Each table is written once, in the
+    representation chosen by select_table; tables="both" writes the plumber
+    and the fitz versions instead.
+    """
+    sources = Counter()
     processed_ids = set()
+    builder = SectionBuilder()
 
     # Index children by parent
     children_by_parent = defaultdict(list)
@@ -38,7 +111,7 @@ def reconstruct_document(plumber_folder, fitz_folder, json_path):
         if parent_id:
             children_by_parent[parent_id].append(el)
 
-    separator_added = False  # Prevent repeating separators
+    separator_added = False  # Consecutive titles share a section
 
     for el in elements:
         element_id = el["element_id"]
@@ -52,21 +125,17 @@ def reconstruct_document(plumber_folder, fitz_folder, json_path):
         # Case: title
         if is_title(el):
             if not separator_added:
-                final_text.append("-------------------------------------------------------------")
+                yield from builder.cut()
                 separator_added = True
 
-            final_text.append(text)
-            final_text.append("")
+            builder.title = text
+            builder.add(el, [text, ""])
 
             # If the title has child tables → add them
             for child in children_by_parent.get(element_id, []):
                 if child.get("type") == "Table":
-                    plumber_content = load_table(child["element_id"], plumber_folder)
-                    final_text.append(f"Table {child['element_id']} (plumber version):\n{plumber_content}\n")
-                    fitz_content = load_table(child["element_id"], fitz_folder)
-                    final_text.append(f"Table {child['element_id']} (fitz version):\n{fitz_content}\n")
-                    final_text.append(f"End of Table {child['element_id']} (fitz version)")
-                    final_text.append("-------------------------------------------------------------")
+                    builder.add(child, table_block(child, plumber_folder, fitz_folder, tables, sources), child["element_id"])
+                    yield from builder.cut()
                     separator_added = False
                     processed_ids.add(child["element_id"])
 
@@ -75,45 +144,69 @@ def reconstruct_document(plumber_folder, fitz_folder, json_path):
         # Case: other non-table elements
         elif block_type != "Table":
             separator_added = False
-            if text.strip():
-                final_text.append(text)
-                final_text.append("")
+            builder.add(el, [text, ""] if text.strip() else [])
             for child in children_by_parent.get(element_id, []):
                 if child["element_id"] in processed_ids:
                     continue
                 if child.get("type") == "Table":
-                    final_text.append("-------------------------------------------------------------")
-                    plumber_content = load_table(child["element_id"], plumber_folder)
-                    final_text.append(f"Table {child['element_id']} (plumber version):\n{plumber_content}\n")
-                    fitz_content = load_table(child["element_id"], fitz_folder)
-                    final_text.append(f"Table {child['element_id']} (fitz version):\n{fitz_content}\n")
-                    final_text.append(f"End of Table {child['element_id']} (fitz version)")
-                    final_text.append("-------------------------------------------------------------")
+                    yield from builder.cut()
+                    builder.add(child, table_block(child, plumber_folder, fitz_folder, tables, sources), child["element_id"])
+                    yield from builder.cut()
                 else:
-                    if child.get("text", "").strip():
-                        final_text.append(child["text"])
-                final_text.append("")
+                    builder.add(child, [child["text"], ""] if child.get("text", "").strip() else [])
                 processed_ids.add(child["element_id"])
             processed_ids.add(element_id)
 
         # Case: standalone table
         elif block_type == "Table" and not parent_id:
             separator_added = False
-            final_text.append("-------------------------------------------------------------")
-            plumber_content = load_table(element_id, plumber_folder)
-            final_text.append(f"Table {element_id} (plumber version):\n{plumber_content}\n")
-            fitz_content = load_table(element_id, fitz_folder)
-            final_text.append(f"Table {element_id} (fitz version):\n{fitz_content}\n")
-            final_text.append(f"End of Table {element_id} (fitz version)")
-            final_text.append("-------------------------------------------------------------")
-            final_text.append("")
+            yield from builder.cut()
+            builder.add(el, table_block(el, plumber_folder, fitz_folder, tables, sources), element_id)
+            yield from builder.cut()
             processed_ids.add(element_id)
 
+    yield from builder.cut()
+
+    if sources:
+        print(f"[INFO] Table representations: {', '.join(f'{source}={count}' for source, count in sorted(sources.items()))}")
+
+
+def render_sections(sections):
+    """Join sections into the reconstructed text, each one opened by a separator line."""
+    return "\n".join(f"{SECTION_SEPARATOR}\n{section['text']}\n" for section in sections)
+
+
+def reconstruct_text(elements, plumber_folder, fitz_folder, tables="best"):
+    """Rebuild the document text from elements and their extracted tables (see iter_sections)."""
+    return render_sections(iter_sections(elements, plumber_folder, fitz_folder, tables))
+
+
+def reconstruct_document(
+    plumber_folder,
+    fitz_folder,
+    json_path,
+    tables="best",
+    sections_path="inputs/file-sections.jsonl",
+    text_path="inputs/file-reconstituted.txt"
+):
+    """Reconstruct a full document from elements and associated tables.
+
+    The sections are written as JSON Lines for the chunker, and the rendered
+    text to text_path for reading.
+    """
+    json_path += ".json"
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        elements = json.load(f)
+
+    sections = list(iter_sections(elements, plumber_folder, fitz_folder, tables))
+    write_jsonl(sections_path, sections)
+
     # Save final reconstructed document
-    with open("inputs/file-reconstituted.txt", "w", encoding="utf-8") as f:
-        f.write("\n".join(final_text))
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write(render_sections(sections))
 
-    print("[OK] Reconstruction complete. Consecutive titles have been grouped.")
+    print(f"[OK] Reconstruction complete: {len(sections)} sections. Consecutive titles have been grouped.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import fitz
+
+# A page with less text than this (characters per 1000 square points, about 200
+# characters on a Letter page), mostly covered by images, is treated as a scan
+MIN_TEXT_DENSITY = 0.4
+SCAN_IMAGE_COVERAGE = 0.5
+# Ruling lines longer than this (in points) count as table borders
+MIN_RULING_LENGTH = 20
+MIN_RULING_LINES = 3
+
+
+def count_ruling_lines(page):
+    """Count long horizontal and vertical strokes drawn on a page."""
+    h_lines = 0
+    v_lines = 0
+    for drawing in page.get_drawings():
+        stroked = drawing.get("color") is not None
+        for item in drawing["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1 and abs(p1.x - p2.x) > MIN_RULING_LENGTH:
+                    h_lines += 1
+                elif abs(p1.x - p2.x) < 1 and abs(p1.y - p2.y) > MIN_RULING_LENGTH:
+                    v_lines += 1
+            elif item[0] == "re":
+                rect = item[1]
+                if rect.height < 2 and rect.width > MIN_RULING_LENGTH:
+                    h_lines += 1
+                elif rect.width < 2 and rect.height > MIN_RULING_LENGTH:
+                    v_lines += 1
+                elif stroked and rect.width > MIN_RULING_LENGTH and rect.height > MIN_RULING_LENGTH:
+                    # Bordered box: two horizontal and two vertical rules
+                    h_lines += 2
+                    v_lines += 2
+    return h_lines, v_lines
+
+
+def inspect_page(page):
+    """Measure the text layer, image coverage and ruling lines of a page."""
+    page_area = page.rect.width * page.rect.height
+    text_chars = len("".join(page.get_text("text").split()))
+
+    image_area = 0.0
+    for img in page.get_images(full=True):
+        for rect in page.get_image_rects(img[0]):
+            image_area += (rect & page.rect).get_area()
+
+    h_lines, v_lines = count_ruling_lines(page)
+    return {
+        "text_chars": text_chars,
+        "text_density": text_chars / page_area * 1000 if page_area else 0.0,
+        "image_coverage": min(1.0, image_area / page_area) if page_area else 0.0,
+        "h_lines": h_lines,
+        "v_lines": v_lines,
+    }
+
+
+def choose_strategy(stats):
+    """Send scanned pages and pages that look like tables to hi_res, the rest to fast."""
+    if stats["text_chars"] == 0:
+        return "hi_res"
+    if stats["text_density"] < MIN_TEXT_DENSITY and stats["image_coverage"] >= SCAN_IMAGE_COVERAGE:
+        return "hi_res"
+    if stats["h_lines"] >= MIN_RULING_LINES and stats["v_lines"] >= 2:
+        return "hi_res"
+    if stats["h_lines"] > MIN_RULING_LINES:
+        # Tables ruled with horizontal lines only
+        return "hi_res"
+    return "fast"
+
+
+def route_pages(pdf_file):
+    """Return the partition strategy chosen for each page of a PDF (index 0 is page 1)."""
+    strategies = []
+    with fitz.open(pdf_file) as doc:
+        for page in doc:
+            stats = inspect_page(page)
+            strategy = choose_strategy(stats)
+            strategies.append(strategy)
+            print(
+                f"[INFO] Page {page.number + 1}: {strategy} "
+                f"(chars={stats['text_chars']}, density={stats['text_density']:.2f}, "
+                f"images={stats['image_coverage']:.0%}, lines={stats['h_lines']}h/{stats['v_lines']}v)"
+            )
+    return strategies
+
+
+if __name__ == "__main__":
+    route_pages("inputs/file_example.pdf")
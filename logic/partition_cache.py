@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import re
+
+import fitz
+
+
+# References that point back to the page tree or to other pages (parents, links,
+# annotation popups); they are not followed, so a page only hashes what it draws
+UNFOLLOWED_REFS = re.compile(rb"/(?:Parent|P|Dest|D|Popup|IRT|Prev|Next|First|Last)\s*\[?\s*\d+\s+\d+\s+R")
+REF = re.compile(rb"(\d+)\s+\d+\s+R")
+
+
+def page_fingerprints(pdf_file):
+    """Hash the content of each page: geometry, the page object and every object it uses.
+
+    Objects are followed recursively from the page (content streams, Form
+    XObjects and their own resources, images, fonts, annotations), so text
+    drawn inside a form or a stamp changes the fingerprint like any other.
+    """
+    xref_digests = {}
+
+    def xref_digest(doc, xref):
+        # Images, fonts and forms are shared between pages, hash each object once
+        if xref not in xref_digests:
+            xref_digests[xref] = f"cycle-{xref}"  # an object referring back to itself
+            source = UNFOLLOWED_REFS.sub(b"", doc.xref_object(xref, compressed=True).encode())
+            h = hashlib.sha256(source)
+            if doc.xref_is_stream(xref):
+                h.update(doc.xref_stream_raw(xref) or b"")
+            for ref in REF.findall(source):
+                h.update(xref_digest(doc, int(ref)).encode())
+            xref_digests[xref] = h.hexdigest()
+        return xref_digests[xref]
+
+    fingerprints = []
+    with fitz.open(pdf_file) as doc:
+        for page in doc:
+            h = hashlib.sha256()
+            h.update(f"{tuple(page.mediabox)}|{page.rotation}".encode())
+            h.update(page.read_contents())
+            h.update(xref_digest(doc, page.xref).encode())
+            # Resources inherited from the page tree are not in the page object
+            for img in page.get_images(full=True):
+                h.update(xref_digest(doc, img[0]).encode())
+            for font in page.get_fonts(full=True):
+                if font[0]:
+                    h.update(xref_digest(doc, font[0]).encode())
+            for xobject in page.get_xobjects():
+                h.update(xref_digest(doc, xobject[0]).encode())
+            fingerprints.append(h.hexdigest())
+    return fingerprints
+
+
+class PartitionCache:
+    """On-disk cache of partitioned page elements with a size cap and LRU eviction.
+
+    Entries are keyed by page content hash plus the partition parameters, and
+    their mtime is refreshed on every hit so the least recently used go first.
+    """
+
+    def __init__(self, folder="inputs/cache/partition", max_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def key(page_hash, params):
+        """Build the cache key of a page for a given set of partition parameters."""
+        params_json = json.dumps(params, sort_keys=True)
+        return hashlib.sha256(f"{page_hash}|{params_json}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached elements of a page, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                elements = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return elements
+
+    def put(self, key, elements):
+        """Store the elements of a page (call evict() once a batch of puts is done)."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(elements, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for filename in os.listdir(self.folder):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.folder, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+            total += stat.st_size
+
+        deleted_count = 0
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.folder, filename))
+                total -= size
+                deleted_count += 1
+            except OSError as e:
+                print(f"[ERROR] Failed to evict {filename}: {e}")
+
+        if deleted_count:
+            print(f"[INFO] Partition cache: {deleted_count} entries evicted.")
+
@@ -1,45 +1,339 @@
+import hashlib
+import io
+import json
+import multiprocessing
 import os
 import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 
-# Create a clean temporary folder
-temp_dir = os.path.join(os.getcwd(), "tmp_ocr")
-os.makedirs(temp_dir, exist_ok=True)
+import fitz
 
-# Force pytesseract / unstructured to use this temp folder
-os.environ["TMPDIR"] = temp_dir
-os.environ["TEMP"] = temp_dir
-os.environ["TMP"] = temp_dir
-
-
-import pytesseract
-# pytesseract.pytesseract.tesseract_cmd = r"C:\Users\grima\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
-# os.environ["TESSDATA_PREFIX"] = r"C:\Users\grima\AppData\Local\Programs\Tesseract-OCR\tessdata"
-
-from unstructured.partition.pdf import partition_pdf
-from unstructured.staging.base import elements_to_json
+from page_router import route_pages
+from partition_cache import PartitionCache, page_fingerprints
 
 # Ensure ONNX DLL path is in environment PATH
 # onnx_dll_path = os.path.join(os.getcwd(), ".venv", "Lib", "site-packages", "onnxruntime")
 # os.environ["PATH"] = onnx_dll_path + ";" + os.environ["PATH"]
 
+_partition_pdf = None
+_worker_pool = None
+_worker_count = 0
+
+
+def load_partitioner():
+    """Import unstructured on first use, it pulls in torch, pytesseract and the layout model code."""
+    global _partition_pdf
+    if _partition_pdf is None:
+        # Create a clean temporary folder
+        temp_dir = os.path.join(os.getcwd(), "tmp_ocr")
+        os.makedirs(temp_dir, exist_ok=True)
+
+        # Force pytesseract / unstructured to use this temp folder
+        os.environ["TMPDIR"] = temp_dir
+        os.environ["TEMP"] = temp_dir
+        os.environ["TMP"] = temp_dir
+        tempfile.tempdir = None  # Re-read the variables above on next use
+
+        import pytesseract  # noqa: F401
+        # pytesseract.pytesseract.tesseract_cmd = r"C:\Users\grima\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
+        # os.environ["TESSDATA_PREFIX"] = r"C:\Users\grima\AppData\Local\Programs\Tesseract-OCR\tessdata"
+
+        from unstructured.partition.pdf import partition_pdf
+        _partition_pdf = partition_pdf
+    return _partition_pdf
+
+
+def preload_models():
+    """Load unstructured, the layout model and the table model once (worker initializer)."""
+    load_partitioner()
+
+    from unstructured.partition.model_init import initialize
+    from unstructured_inference.models import tables
+
+    initialize()
+    tables.load_agent()
+    print(f"[INFO] Partition worker {os.getpid()} ready.")
+
+
+def get_worker_pool(workers):
+    """Return the long-lived partition worker pool, started with models preloaded on first use.
 
-def partition_pdf_to_json(pdf_path: str, json_partitioned: str):
-    """Partition a PDF into structured JSON using Unstructured with hi_res strategy."""
-    print("[INFO] Starting PDF partition with hi_res strategy...")
+    Workers are spawned rather than forked since they outlive the call and the
+    host process (Streamlit) runs threads.
+    """
+    global _worker_pool, _worker_count
+    workers = max(1, workers)
+    if _worker_pool is None or _worker_count != workers:
+        shutdown_workers()
+        _worker_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=preload_models,
+        )
+        _worker_count = workers
+    return _worker_pool
 
-    elements = partition_pdf(
-        filename=pdf_path + ".pdf",
-        strategy="hi_res",  # High resolution strategy using vision models
-        extract_images_in_pdf=False,
-        languages=["eng"],
-        extract_image_block_to_payload=False,
-        infer_table_structure=True,
-        skip_infer_table_types=False
+
+def shutdown_workers():
+    """Stop the long-lived partition worker pool, if any."""
+    global _worker_pool, _worker_count
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
+        _worker_pool = None
+        _worker_count = 0
+
+
+PARTITION_PARAMS = {
+    "strategy": "hi_res",  # High resolution strategy using vision models
+    "extract_images_in_pdf": False,
+    "languages": ["eng"],
+    "extract_image_block_to_payload": False,
+    "infer_table_structure": True,
+    "skip_infer_table_types": False,
+}
+
+# Text-layer path for plain pages, no layout model and no OCR
+FAST_PARTITION_PARAMS = {
+    "strategy": "fast",
+    "languages": ["eng"],
+    "infer_table_structure": False,
+}
+
+PARAMS_BY_STRATEGY = {"hi_res": PARTITION_PARAMS, "fast": FAST_PARTITION_PARAMS}
+
+# Resolution hi_res renders pages at, which defines its PixelSpace coordinates
+LAYOUT_DPI = 200
+
+# Parent/child rules unstructured applies once a whole document is partitioned
+HIERARCHY_RULES = {
+    "Title": ["Text", "UncategorizedText", "NarrativeText", "ListItem", "BulletedText", "Table", "FigureCaption", "CheckBox"],
+    "Header": ["Title", "Text", "UncategorizedText", "NarrativeText", "ListItem", "BulletedText", "Table", "FigureCaption", "CheckBox"],
+}
+
+
+def to_layout_space(elements, dpi=LAYOUT_DPI):
+    """Scale text-layer coordinates (PDF points) to the pixel space hi_res elements use."""
+    factor = dpi / 72
+    for el in elements:
+        coords = el.get("metadata", {}).get("coordinates")
+        if not coords:
+            continue
+        coords["points"] = [[x * factor, y * factor] for x, y in coords["points"]]
+        coords["layout_width"] = round(coords["layout_width"] * factor)
+        coords["layout_height"] = round(coords["layout_height"] * factor)
+        coords["system"] = "PixelSpace"
+    return elements
+
+
+def partition_page_range(pdf_file, first_page, last_page, params=PARTITION_PARAMS):
+    """Partition pages first_page..last_page (1-based, inclusive) and return their elements as dicts."""
+    start = time.perf_counter()
+
+    with fitz.open(pdf_file) as src, fitz.open() as part:
+        part.insert_pdf(src, from_page=first_page - 1, to_page=last_page - 1)
+        data = part.tobytes()
+
+    # Same filename, dates and page numbers as a whole-document run, so element ids hash identically
+    elements = load_partitioner()(
+        file=io.BytesIO(data),
+        metadata_filename=pdf_file,
+        metadata_last_modified=datetime.fromtimestamp(os.path.getmtime(pdf_file)).strftime("%Y-%m-%dT%H:%M:%S"),
+        starting_page_number=first_page,
+        **params
     )
 
-    elements_to_json(elements=elements, filename=f"{json_partitioned}.json")
+    elements = [el.to_dict() for el in elements]
+    if params["strategy"] != "hi_res":
+        to_layout_space(elements)
+    return elements, time.perf_counter() - start
+
+
+def set_element_hierarchy(elements):
+    """Recompute parent_id links over a merged element list, as unstructured does for a single run."""
+    stack = []
+    for el in elements:
+        meta = el.setdefault("metadata", {})
+        meta.pop("parent_id", None)
+        category = el.get("type")
+        depth = meta.get("category_depth") or 0
+
+        parent_id = None
+        while stack:
+            top = stack[-1]
+            top_depth = top["metadata"].get("category_depth") or 0
+            if (top["type"] == category and top_depth < depth) or (
+                top["type"] != category and category in HIERARCHY_RULES.get(top["type"], [])
+            ):
+                parent_id = top["element_id"]
+                break
+            stack.pop()
+
+        if parent_id:
+            meta["parent_id"] = parent_id
+        stack.append(el)
+    return elements
+
+
+def partition_ranges(pdf_file, ranges, page_params, workers, keep_workers=False):
+    """Partition page ranges and return {first_page: elements}.
+
+    Ranges run in a process pool when workers > 1, or always in the long-lived
+    worker pool when keep_workers is set.
+    """
+    results = {}
+
+    def report(first, last, elements, seconds):
+        results[first] = elements
+        strategy = page_params[first - 1]["strategy"]
+        print(f"[INFO] Pages {first}-{last} ({strategy}): {len(elements)} elements in {seconds:.1f}s ({seconds / (last - first + 1):.1f}s/page)")
+
+    if workers <= 1 and not keep_workers:
+        for first, last in ranges:
+            report(first, last, *partition_page_range(pdf_file, first, last, page_params[first - 1]))
+        return results
+
+    if keep_workers:
+        pool = get_worker_pool(workers)
+    else:
+        # Spawned like the long-lived pool: forking a process that loaded torch or OpenMP can deadlock
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {
+            pool.submit(partition_page_range, pdf_file, first, last, page_params[first - 1]): (first, last)
+            for first, last in ranges
+        }
+        for future in as_completed(futures):
+            report(*futures[future], *future.result())
+    finally:
+        if not keep_workers:
+            pool.shutdown()
+    return results
+
+
+def plan_ranges(pages, page_params, pages_per_batch):
+    """Group sorted page numbers into runs of consecutive pages sharing the same parameters."""
+    ranges = []
+    for page in pages:
+        if (
+            ranges
+            and ranges[-1][1] == page - 1
+            and page - ranges[-1][0] < pages_per_batch
+            and page_params[page - 1] == page_params[ranges[-1][0] - 1]
+        ):
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+def restamp_page(elements, pdf_file, page_number, last_modified):
+    """Attach cached page elements to the current file and page number.
+
+    Moved elements get their id re-hashed the way unstructured does it
+    (filename, text, page number and index on the page).
+    """
+    file_directory, filename = os.path.split(pdf_file)
+    for seq, el in enumerate(elements):
+        meta = el.setdefault("metadata", {})
+        moved = meta.get("filename") != filename or meta.get("page_number") != page_number
+        meta.update(filename=filename, page_number=page_number, last_modified=last_modified)
+        if file_directory:
+            meta["file_directory"] = file_directory
+        if moved:
+            data = f"{filename}{el.get('text', '')}{page_number}{seq}"
+            el["element_id"] = hashlib.sha256(data.encode()).hexdigest()[:32]
+    return elements
+
+
+def partition_document(pdf_file, strategy="hi_res", workers=1, pages_per_batch=4, cache=None, keep_workers=False):
+    """Partition a PDF page range by page range and merge the elements in page order.
+
+    strategy="auto" routes each page to hi_res or fast with page_router. With a
+    cache, pages whose content and parameters did not change are reused.
+    """
+    if strategy == "auto":
+        page_params = [PARAMS_BY_STRATEGY[s] for s in route_pages(pdf_file)]
+    else:
+        with fitz.open(pdf_file) as doc:
+            page_params = [PARAMS_BY_STRATEGY[strategy]] * doc.page_count
+    page_count = len(page_params)
+
+    pages = {}
+    keys = []
+    if cache is not None:
+        last_modified = datetime.fromtimestamp(os.path.getmtime(pdf_file)).strftime("%Y-%m-%dT%H:%M:%S")
+        for page_number, fingerprint in enumerate(page_fingerprints(pdf_file), start=1):
+            key = PartitionCache.key(fingerprint, page_params[page_number - 1])
+            keys.append(key)
+            elements = cache.get(key)
+            if elements is not None:
+                pages[page_number] = restamp_page(elements, pdf_file, page_number, last_modified)
+
+    missing = [page_number for page_number in range(1, page_count + 1) if page_number not in pages]
+    if cache is not None:
+        print(f"[INFO] Partition cache: {len(pages)} pages reused, {len(missing)} pages to partition.")
+
+    if missing:
+        ranges = plan_ranges(missing, page_params, pages_per_batch)
+        print(f"[INFO] Partitioning {len(missing)} pages in {len(ranges)} ranges with {workers} workers...")
+        for elements in partition_ranges(pdf_file, ranges, page_params, workers, keep_workers).values():
+            for el in elements:
+                pages.setdefault(el["metadata"]["page_number"], []).append(el)
+        for page_number in missing:
+            pages.setdefault(page_number, [])
+            if cache is not None:
+                cache.put(keys[page_number - 1], pages[page_number])
+        if cache is not None:
+            cache.evict()
+
+    merged = []
+    for page_number in range(1, page_count + 1):
+        merged.extend(pages[page_number])
+    return set_element_hierarchy(merged)
+
+
+def partition_elements(
+    pdf_file: str,
+    workers: int = 1,
+    pages_per_batch: int = 4,
+    cache_folder: str = None,
+    strategy: str = "hi_res",
+    keep_workers: bool = False,
+):
+    """Partition a PDF file with Unstructured and return its elements as dicts.
+
+    strategy is "hi_res" for every page, or "auto" to send only table and scanned
+    pages to hi_res and plain pages through the fast text-layer path.
+    With workers > 1 the PDF is split into ranges of pages_per_batch pages that are
+    partitioned in parallel processes, then merged back into one element list.
+    With a cache_folder (e.g. "inputs/cache/partition"), only pages missing from the
+    per-page cache are partitioned; the cache is opt-in since it partitions page
+    ranges and rebuilds the element hierarchy itself (see set_element_hierarchy),
+    while the default single-worker hi_res run is one unstructured call.
+    With keep_workers, partitioning runs in a long-lived worker pool that loads the
+    layout and table models once and serves every following document.
+    """
+    print(f"[INFO] Starting PDF partition with {strategy} strategy...")
+    start = time.perf_counter()
+
+    if strategy == "hi_res" and workers <= 1 and not cache_folder and not keep_workers:
+        elements = [el.to_dict() for el in load_partitioner()(filename=pdf_file, **PARTITION_PARAMS)]
+    else:
+        cache = PartitionCache(cache_folder) if cache_folder else None
+        elements = partition_document(pdf_file, strategy, workers, pages_per_batch, cache, keep_workers)
+
+    print(f"[OK] PDF partitioning finished in {time.perf_counter() - start:.1f}s.")
+    return elements
+
+
+def partition_pdf_to_json(pdf_path: str, json_partitioned: str, **kwargs):
+    """Partition a PDF into structured JSON using Unstructured (options as in partition_elements)."""
+    elements = partition_elements(pdf_path + ".pdf", **kwargs)
 
-    print("[OK] PDF partitioning finished.")
+    with open(f"{json_partitioned}.json", "w", encoding="utf-8") as f:
+        json.dump(elements, f, indent=4, sort_keys=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+import os
+import time
+
+from artifacts import write_jsonl
+from chunking import chunk_sections, number_chunks
+from cleaning import clean_elements
+from embedding import vectorize_documents
+from extract_direct import extract_tables_direct
+from extractfitz import extract_fitz_clips
+from extractplumber import extract_plumber_clips
+from isolate_pdf import clip_tables
+from merging import iter_sections, render_sections
+from partitioning import partition_elements
+
+
+def run_pipeline(
+    pdf_path,
+    vectorstore_folder="inputs/vectorstore",
+    artifacts_folder=None,
+    table_mode="direct",
+    extract_workers=1,
+    max_tokens=None,
+    incremental=False,
+    index_type="flat",
+    storage="float32",
+    **partition_kwargs
+):
+    """Run every stage from PDF to FAISS index, handing elements, text and chunks over in memory.
+
+    Merging streams sections (with their pages and element ids) straight into
+    the chunker. With an artifacts_folder, each stage output is also written
+    there for debugging (JSON Lines for elements, sections and chunks, plain
+    text for the reconstructed document).
+    table_mode is "direct" (read tables straight from the source pages) or "clips"
+    (extract them from one in-memory clip PDF); extract_workers spreads direct
+    extraction over a process pool. max_tokens switches chunking to token
+    budgets (see token_chunking), incremental updates an existing index
+    with only the chunks that changed (see update_index), and index_type
+    and storage pick the FAISS index (see index_factory).
+    Returns the chunks, or None if vectorization failed.
+    """
+    start = time.perf_counter()
+    pdf_file = pdf_path + ".pdf"
+    name = os.path.basename(pdf_path)
+
+    def artifact(filename, records):
+        if artifacts_folder:
+            write_jsonl(os.path.join(artifacts_folder, filename), records)
+
+    # 1-2. Partition and clean
+    elements = partition_elements(pdf_file, **partition_kwargs)
+    artifact(f"{name}-partitioned.jsonl", elements)
+    elements = clean_elements(elements)
+    artifact(f"{name}-partitioned-cleaned.jsonl", elements)
+
+    # 3-5. Isolate and extract tables
+    if table_mode == "direct":
+        fitz_tables, plumber_tables = extract_tables_direct(pdf_file, elements, workers=extract_workers)
+    else:
+        clip_pdf, element_ids = clip_tables(pdf_file, elements)
+        fitz_tables = extract_fitz_clips(clip_pdf, element_ids)
+        plumber_tables = extract_plumber_clips(clip_pdf, element_ids)
+        if artifacts_folder:
+            with open(os.path.join(artifacts_folder, f"{name}-tables.pdf"), "wb") as f:
+                f.write(clip_pdf)
+
+    # 6. Merge
+    sections = iter_sections(elements, plumber_tables, fitz_tables)
+    if artifacts_folder:
+        sections = list(sections)
+        artifact(f"{name}-sections.jsonl", sections)
+        with open(os.path.join(artifacts_folder, f"{name}-reconstituted.txt"), "w", encoding="utf-8") as f:
+            f.write(render_sections(sections))
+
+    # 7-8. Chunk and vectorize
+    if max_tokens:
+        from token_chunking import chunk_sections_by_tokens
+        chunks = number_chunks(chunk_sections_by_tokens(sections, max_tokens=max_tokens))
+    else:
+        chunks = number_chunks(chunk_sections(sections))
+    artifact(f"{name}-chunked.jsonl", chunks)
+    if vectorize_documents(chunks, vectorstore_folder, incremental, index_type=index_type, storage=storage) is None:
+        print(f"[ERROR] Pipeline failed: {name} could not be vectorized.")
+        return None
+
+    print(f"[OK] Pipeline finished in {time.perf_counter() - start:.1f}s ({len(chunks)} chunks).")
+    return chunks
+
+
+if __name__ == "__main__":
+    from corpus import add_document
+
+    add_document("inputs/file_example", strategy="auto")
@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Registry of the documents of a corpus, kept apart from corpus.py so it can be
+# read (e.g. by the app to list documents) without importing FAISS or LangChain
+
+CORPUS_FOLDER = "inputs/corpus"
+REGISTRY_FILE = "registry.json"
+REGISTRY_LOCK_FILE = "registry.lock"
+
+
+def document_id(path):
+    """Shard id of a document: its file name without extension, reduced to safe characters."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+def shard_folder(corpus_folder, doc_id):
+    return os.path.join(corpus_folder, "shards", doc_id)
+
+
+def read_registry(corpus_folder=CORPUS_FOLDER):
+    """The registry of a corpus: {"shards": {doc_id: {"folder", "source", "chunks", ...}}}."""
+    path = os.path.join(corpus_folder, REGISTRY_FILE)
+    if not os.path.exists(path):
+        return {"shards": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_registry(corpus_folder, registry):
+    """Replace the registry atomically, so readers see either the old or the new one."""
+    os.makedirs(corpus_folder, exist_ok=True)
+    path = os.path.join(corpus_folder, REGISTRY_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def registry_lock(corpus_folder):
+    """Hold the registry's file lock, so read-modify-write updates do not overwrite each other.
+
+    flock (msvcrt.locking on Windows) excludes other processes as well as
+    other threads (each opens its own lock file descriptor); readers do not
+    need it since the registry is replaced atomically.
+    """
+    os.makedirs(corpus_folder, exist_ok=True)
+    with open(os.path.join(corpus_folder, REGISTRY_LOCK_FILE), "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:  # LK_LOCK gives up after 10 seconds, wait as long as flock does
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+if __name__ == "__main__":
+    print(json.dumps(read_registry(), indent=2))
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+
+from corpus import SEARCH_WORKERS, load_shard, print_results, search_shards, select_shards
+from embedding_cache import cached_client
+from index_factory import META_FILE
+from registry import CORPUS_FOLDER, REGISTRY_FILE, read_registry
+from vector_store import DOCSTORE_FILE, INDEX_FILE, current_version, store_exists
+
+ollama_base_url = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+
+QUERY_CACHE_SIZE = 1024
+POLL_INTERVAL = 2.0  # seconds between checks for a new index
+
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
+
+def file_signature(*paths):
+    """(mtime, size) of each file, None for missing ones: changes whenever a file is replaced."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def shard_signature(folder):
+    """The published version of a shard (file signatures for stores saved before versioning)."""
+    return current_version(folder) or file_signature(
+        *(os.path.join(folder, name) for name in (INDEX_FILE, DOCSTORE_FILE, META_FILE))
+    )
+
+
+class Retriever:
+    """Long-lived, thread-safe searcher over a corpus.
+
+    Shards are loaded (memory-mapped) once and kept, query embeddings are
+    kept in an LRU of query_cache_size entries, and a daemon thread checks
+    the registry and the published version of each shard every
+    poll_interval seconds, loading the shards that changed in the
+    background. Searches never wait for a reload: they run on the set of
+    shards loaded last, which is swapped in one assignment once the new
+    versions are loaded.
+    """
+
+    def __init__(
+        self,
+        corpus_folder=CORPUS_FOLDER,
+        embeddings=None,
+        query_cache_size=QUERY_CACHE_SIZE,
+        poll_interval=POLL_INTERVAL,
+        workers=SEARCH_WORKERS
+    ):
+        self.corpus_folder = corpus_folder
+        self.embeddings = embeddings or cached_client(base_url=ollama_base_url)
+        self.query_cache_size = query_cache_size
+        self.workers = workers
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+        self._query_vectors = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._shards = {}  # doc_id -> (signature, db, metadata, lexical)
+        self._registry = {"shards": {}}
+        self._registry_signature = None
+        self._stop = threading.Event()
+
+        self.refresh()
+        if poll_interval:
+            self._thread = threading.Thread(target=self._watch, args=(poll_interval,), daemon=True)
+            self._thread.start()
+
+    def _watch(self, poll_interval):
+        while not self._stop.wait(poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[ERROR] Index reload failed: {e}")
+
+    def refresh(self):
+        """Load the shards added or changed since the last call and drop removed ones."""
+        with self._refresh_lock:
+            registry_signature = file_signature(os.path.join(self.corpus_folder, REGISTRY_FILE))
+            if registry_signature != self._registry_signature:
+                self._registry = read_registry(self.corpus_folder)
+                self._registry_signature = registry_signature
+
+            shards = {}
+            for doc_id, entry in self._registry["shards"].items():
+                folder = os.path.join(self.corpus_folder, entry["folder"])
+                signature = shard_signature(folder)
+                loaded = self._shards.get(doc_id)
+                if loaded and loaded[0] == signature:
+                    shards[doc_id] = loaded
+                    continue
+                if not store_exists(folder):
+                    continue
+                # Versions are immutable once published, so whatever is loaded is complete
+                db, metadata, lexical = load_shard(folder, self.embeddings)
+                shards[doc_id] = (metadata["version"] or signature, db, metadata, lexical)
+                if loaded:
+                    self.reloads += 1
+                    print(f"[INFO] Shard {doc_id} reloaded: {metadata['version']} ({db.index.ntotal} chunks).")
+
+            # Published in one assignment: a search reads either the old or the new set of shards
+            self._shards = shards
+
+    def embed_query(self, query):
+        """Embedding of a query, from the LRU when it was asked recently."""
+        with self._cache_lock:
+            vector = self._query_vectors.get(query)
+            if vector is not None:
+                self._query_vectors.move_to_end(query)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(query)
+        with self._cache_lock:
+            self._query_vectors[query] = vector
+            while len(self._query_vectors) > self.query_cache_size:
+                self._query_vectors.popitem(last=False)
+        return vector
+
+    def search(self, query, k=3, doc_ids=None, pages=None, debug=False, mode="hybrid"):
+        """Search the loaded shards like corpus.search_corpus, without loading anything.
+
+        In lexical mode the query is not embedded (unless a shard has no lexical index).
+        """
+        loaded = self._shards
+        if not loaded or any(doc_id not in loaded for doc_id in doc_ids or ()):
+            # A document added since the last poll: load it now rather than fail
+            self.refresh()
+            loaded = self._shards
+        selected = select_shards(loaded, doc_ids, self.corpus_folder)
+        stores = {doc_id: shard[1:] for doc_id, shard in selected.items()}
+        needs_vector = mode != "lexical" or any(lexical is None for _, _, lexical in stores.values())
+        vector = self.embed_query(query) if needs_vector else None
+        results = search_shards(stores, vector, k, pages, self.workers, query, mode)
+
+        if debug:
+            print(
+                f"[DEBUG] Retriever: {len(loaded)} shards, query cache {self.hits} hits / "
+                f"{self.misses} misses, {self.reloads} reloads"
+            )
+            print_results(results)
+        return results
+
+    def close(self):
+        self._stop.set()
+
+
+def get_retriever(corpus_folder=CORPUS_FOLDER):
+    """The process-wide Retriever of a corpus, created on first use."""
+    with _retrievers_lock:
+        retriever = _retrievers.get(corpus_folder)
+        if retriever is None:
+            retriever = _retrievers[corpus_folder] = Retriever(corpus_folder)
+        return retriever
@@ -0,0 +1,102 @@
+import time
+from collections import Counter, defaultdict
+
+import fitz  # PyMuPDF
+
+from isolate_pdf import add_clip_page
+
+# A find_tables result is kept only if it passes these checks, else pdfplumber is tried
+MIN_ROWS = 2
+MIN_COLUMNS = 2
+MAX_EMPTY_CELL_RATIO = 0.7
+MIN_COLUMN_CONSISTENCY = 0.9
+
+
+def table_quality(rows):
+    """Measure the size, empty-cell ratio and column consistency of extracted rows."""
+    if not rows:
+        return {"rows": 0, "columns": 0, "empty_ratio": 1.0, "consistency": 0.0}
+
+    cells = [cell for row in rows for cell in row]
+    empty = sum(1 for cell in cells if cell is None or not str(cell).strip())
+    widths = Counter(len(row) for row in rows)
+    columns, modal_count = widths.most_common(1)[0]
+    return {
+        "rows": len(rows),
+        "columns": columns,
+        "empty_ratio": empty / len(cells) if cells else 1.0,
+        "consistency": modal_count / len(rows),
+    }
+
+
+def is_good_table(rows):
+    """Whether extracted rows look like a real table."""
+    quality = table_quality(rows)
+    return (
+        quality["rows"] >= MIN_ROWS
+        and quality["columns"] >= MIN_COLUMNS
+        and quality["empty_ratio"] <= MAX_EMPTY_CELL_RATIO
+        and quality["consistency"] >= MIN_COLUMN_CONSISTENCY
+    )
+
+
+def fitz_table_rows(page, clip=None):
+    """Rows of the largest table PyMuPDF's find_tables detects in a page area, or None."""
+    if clip is not None:
+        # find_tables looks for header text over the whole page; on a page cut
+        # down to the clip it only scans the table area (same rows, much faster)
+        with fitz.open() as clip_doc:
+            add_clip_page(clip_doc, page.parent, page.number + 1, clip)
+            return fitz_table_rows(clip_doc[0])
+
+    tables = page.find_tables().tables
+    if not tables:
+        return None
+    table = max(tables, key=lambda t: (t.bbox[2] - t.bbox[0]) * (t.bbox[3] - t.bbox[1]))
+    return table.extract()
+
+
+def extract_table_rows(page, open_plumber_crop, clip=None, engine="auto"):
+    """Extract the main table of a page area.
+
+    engine="auto" tries PyMuPDF find_tables first and falls back to pdfplumber
+    when it finds nothing or fails the quality checks; "fitz" and "plumber"
+    force one engine. open_plumber_crop returns the pdfplumber page (cropped to
+    the same area) and is only called when pdfplumber is needed.
+    Returns (rows or None, engine used).
+    """
+    if engine in ("auto", "fitz"):
+        try:
+            rows = fitz_table_rows(page, clip)
+        except Exception as e:
+            print(f"  find_tables failed: {e}")
+            rows = None
+        if engine == "fitz" or (rows and is_good_table(rows)):
+            return rows, "fitz"
+
+    return open_plumber_crop().extract_table(), "plumber"
+
+
+class TableStats:
+    """Per-engine counts and timings of table extractions."""
+
+    def __init__(self):
+        self.seconds = defaultdict(list)
+
+    def add(self, engine, seconds):
+        self.seconds[engine].append(seconds)
+
+    def timed(self, func, *args, **kwargs):
+        """Call an extract_table_rows-like function and record its engine and duration."""
+        start = time.perf_counter()
+        rows, engine = func(*args, **kwargs)
+        self.add(engine, time.perf_counter() - start)
+        return rows, engine
+
+    def report(self):
+        total = sum(len(s) for s in self.seconds.values())
+        for engine, seconds in sorted(self.seconds.items()):
+            print(
+                f"[INFO] Table engine {engine}: {len(seconds)}/{total} tables, "
+                f"avg {sum(seconds) / len(seconds) * 1000:.0f} ms, max {max(seconds) * 1000:.0f} ms"
+            )
@@ -0,0 +1,116 @@
+import re
+from collections import Counter
+
+# A plumber table is kept only if its rows are consistent and it has the numbers fitz sees
+MIN_ROW_CONSISTENCY = 0.8
+MIN_NUMERIC_AGREEMENT = 0.9
+# Below this fill rate the empty cells are layout artifacts (staggered cells) and are dropped
+SPARSE_FILL_RATE = 0.5
+
+CELL_SEPARATOR = " | "
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def table_rows(plumber_text):
+    """Split a plumber table text (see table_to_text) back into rows of cells.
+
+    Cells may span several lines, so lines are joined until a row has the
+    modal number of cell separators.
+    """
+    lines = [line for line in plumber_text.splitlines() if line.strip()]
+    separator_counts = Counter(line.count("|") for line in lines if "|" in line)
+    if not separator_counts:
+        return [[" ".join(line.split())] for line in lines]
+    separators = separator_counts.most_common(1)[0][0]
+
+    rows = []
+    current = []
+    count = 0
+    for line in lines:
+        current.append(line)
+        count += line.count("|")
+        if count >= separators:
+            rows.append([" ".join(cell.split()) for cell in "\n".join(current).split("|")])
+            current = []
+            count = 0
+    if current:
+        rows.append([" ".join(cell.split()) for cell in "\n".join(current).split("|")])
+    return rows
+
+
+def table_scores(plumber_text, fitz_text):
+    """Score a plumber table against the fitz text of the same zone.
+
+    fill_rate is the share of non-empty cells, consistency the share of rows
+    with the modal number of cells, numeric_agreement the share of numeric
+    tokens both extractions agree on and word_coverage the share of fitz
+    words found in the plumber table.
+    """
+    rows = table_rows(plumber_text)
+    cells = [cell for row in rows for cell in row]
+    widths = Counter(len(row) for row in rows)
+
+    plumber_numbers = Counter(NUMBER_PATTERN.findall(plumber_text))
+    fitz_numbers = Counter(NUMBER_PATTERN.findall(fitz_text))
+    number_total = max(sum(plumber_numbers.values()), sum(fitz_numbers.values()))
+
+    plumber_words = set(WORD_PATTERN.findall(plumber_text.lower()))
+    fitz_words = set(WORD_PATTERN.findall(fitz_text.lower()))
+
+    return {
+        "fill_rate": sum(1 for cell in cells if cell) / len(cells) if cells else 0.0,
+        "consistency": widths.most_common(1)[0][1] / len(rows) if rows else 0.0,
+        "numeric_agreement": sum((plumber_numbers & fitz_numbers).values()) / number_total if number_total else 1.0,
+        "word_coverage": len(plumber_words & fitz_words) / len(fitz_words) if fitz_words else 1.0,
+    }
+
+
+def compact_rows(plumber_text):
+    """Rewrite a plumber table with one line per row and without empty cells."""
+    lines = []
+    for row in table_rows(plumber_text):
+        cells = [cell for cell in row if cell]
+        if cells:
+            lines.append(CELL_SEPARATOR.join(cells))
+    return "\n".join(lines)
+
+
+def missing_lines(fitz_text, table_text):
+    """Lines of the fitz text with words the table does not contain."""
+    table_words = set(WORD_PATTERN.findall(table_text.lower()))
+    return [
+        line.strip() for line in fitz_text.splitlines()
+        if any(word not in table_words for word in WORD_PATTERN.findall(line.lower()))
+    ]
+
+
+def select_table(plumber_text, fitz_text, fallback_text=""):
+    """Choose one representation of a table from its plumber and fitz extractions.
+
+    The plumber table is used when its rows are consistent and its numbers
+    agree with fitz (sparse tables are compacted, and fitz lines it misses
+    are appended as a merged version). Otherwise the fitz text is used, and
+    the element's own text when neither extractor found anything.
+    Returns (source, content).
+    """
+    plumber_text = (plumber_text or "").strip()
+    fitz_text = (fitz_text or "").strip()
+
+    if plumber_text:
+        scores = table_scores(plumber_text, fitz_text)
+        if not fitz_text or (
+            scores["consistency"] >= MIN_ROW_CONSISTENCY
+            and scores["numeric_agreement"] >= MIN_NUMERIC_AGREEMENT
+        ):
+            content = compact_rows(plumber_text) if scores["fill_rate"] < SPARSE_FILL_RATE else plumber_text
+            extra = missing_lines(fitz_text, content) if scores["word_coverage"] < 1.0 else []
+            if extra:
+                return "merged", content + "\n" + "\n".join(extra)
+            return "plumber", content
+
+    if fitz_text:
+        return "fitz", fitz_text
+    if fallback_text.strip():
+        return "unstructured", fallback_text.strip()
+    return "missing", "[Table missing]"
@@ -0,0 +1,175 @@
+import functools
+import os
+
+from chunking import chunk_sections, merge_metadata
+
+# nomic-embed-text uses the bert-base-uncased WordPiece vocabulary. The tokenizer
+# is downloaded from the Hugging Face hub on first use (then read from its cache);
+# set CHUNK_TOKENIZER to a local tokenizer folder to run without network access.
+TOKENIZER_NAME = os.environ.get("CHUNK_TOKENIZER", "nomic-ai/nomic-embed-text-v1.5")
+MAX_TOKENS = 512
+OVERLAP_TOKENS = 64
+TOKENIZE_BATCH_SIZE = 256
+CHARS_PER_TOKEN = 4  # average for English text, sizes the character fallback
+
+# Preferred places to cut an oversized section, best first
+BOUNDARY_LINE = 3
+BOUNDARY_SENTENCE = 2
+BOUNDARY_WORD = 1
+
+
+@functools.lru_cache(maxsize=4)
+def load_tokenizer(name=TOKENIZER_NAME):
+    """Load a (fast) Hugging Face tokenizer once per process; None if it cannot be loaded
+    (transformers missing, or no network and no cached or local copy)."""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"[ERROR] Failed to load tokenizer {name}: {e}")
+        return None
+
+
+def token_offsets(texts, tokenizer, batch_size=TOKENIZE_BATCH_SIZE):
+    """Character offsets of the tokens of each text, tokenizing batch_size texts per call."""
+    offsets = []
+    for i in range(0, len(texts), batch_size):
+        encoded = tokenizer(
+            texts[i:i + batch_size],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        offsets.extend(encoded["offset_mapping"])
+    return offsets
+
+
+def boundary_kind(text, offsets, k):
+    """How good a cut between token k - 1 and token k is (0: inside a word)."""
+    gap = text[offsets[k - 1][1]:offsets[k][0]]
+    if "\n" in gap:
+        return BOUNDARY_LINE
+    if gap and gap.isspace():
+        return BOUNDARY_SENTENCE if text[offsets[k - 1][1] - 1] in ".!?:;" else BOUNDARY_WORD
+    if text[offsets[k - 1][1] - 1] == "|" or text[offsets[k][0]] == "|":
+        # Table cell separators are glued to their neighbours by the tokenizer
+        return BOUNDARY_WORD
+    return 0
+
+
+def split_by_tokens(text, offsets, max_tokens, overlap_tokens):
+    """Cut a text into windows of at most max_tokens tokens overlapping by overlap_tokens.
+
+    Each window ends at the best boundary (line break, then sentence end, then
+    word break) in its second half, and the next one starts on a line or word break.
+    """
+    windows = []
+    n = len(offsets)
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        if end < n:
+            best_kind = 0
+            best_end = end
+            for k in range(end, start + max_tokens // 2, -1):
+                kind = boundary_kind(text, offsets, k)
+                if kind > best_kind:
+                    best_kind = kind
+                    best_end = k
+                    if kind == BOUNDARY_LINE:
+                        break
+            end = best_end
+
+        windows.append((text[offsets[start][0]:offsets[end - 1][1]].strip(), end - start))
+        if end >= n:
+            break
+
+        # Start the overlap on the first line break in it, else on a word break
+        first = max(end - overlap_tokens, start + 1)
+        kinds = [(boundary_kind(text, offsets, k), k) for k in range(first, end)]
+        line_starts = [k for kind, k in kinds if kind == BOUNDARY_LINE]
+        word_starts = [k for kind, k in kinds if kind]
+        start = line_starts[0] if line_starts else word_starts[0] if word_starts else end
+    return windows
+
+
+def chunk_sections_by_tokens(
+    sections,
+    tokenizer=None,
+    separator=None,
+    max_tokens=MAX_TOKENS,
+    overlap_tokens=OVERLAP_TOKENS,
+    batch_size=TOKENIZE_BATCH_SIZE
+):
+    """Pack a stream of sections into chunks of at most max_tokens tokens.
+
+    Token-budget version of chunking.chunk_sections: sections are tokenized in
+    batches with the embedding model's tokenizer, small ones are grouped up to
+    max_tokens and larger ones are split on boundaries with overlap_tokens of
+    overlap. Sections are joined by a blank line rather than the separator
+    line, which would cost 61 tokens each (pass separator to keep it).
+    Yields {"text", "metadata"} dicts; metadata["tokens"] is the chunk's
+    token count. When the tokenizer cannot be loaded, sections are chunked
+    by characters instead (chunking.chunk_sections, CHARS_PER_TOKEN
+    characters per token), without token counts.
+    """
+    tokenizer = tokenizer or load_tokenizer()
+    if tokenizer is None:
+        print("[INFO] Chunking by characters instead of tokens.")
+        separator_kwargs = {"separator": separator} if separator else {}
+        yield from chunk_sections(
+            sections,
+            max_chunk_size=max_tokens * CHARS_PER_TOKEN,
+            overlap=overlap_tokens * CHARS_PER_TOKEN,
+            **separator_kwargs
+        )
+        return
+    if overlap_tokens >= max_tokens:
+        overlap_tokens = max_tokens // 2
+
+    joiner = "\n" if separator else "\n\n"
+    current_parts = []
+    current_meta = []
+    current_tokens = 0
+
+    def flush():
+        metadata = dict(merge_metadata(current_meta), tokens=current_tokens)
+        return {"text": joiner.join(current_parts).strip(), "metadata": metadata}
+
+    batch = []
+    sections = iter(sections)
+    while True:
+        batch.clear()
+        for section in sections:
+            if section["text"].strip():
+                batch.append(section)
+                if len(batch) == batch_size:
+                    break
+        if not batch:
+            break
+
+        part_texts = [
+            f"{separator}\n{section['text'].strip()}" if separator else section["text"].strip()
+            for section in batch
+        ]
+        for section, part_text, offsets in zip(batch, part_texts, token_offsets(part_texts, tokenizer, batch_size)):
+            part_tokens = len(offsets)
+
+            if part_tokens > max_tokens:
+                if current_parts:
+                    yield flush()
+                    current_parts, current_meta, current_tokens = [], [], 0
+                metadata = merge_metadata([section])
+                for window, window_tokens in split_by_tokens(part_text, offsets, max_tokens, overlap_tokens):
+                    yield {"text": window, "metadata": dict(metadata, tokens=window_tokens)}
+            elif current_tokens + part_tokens <= max_tokens:
+                current_parts.append(part_text)
+                current_meta.append(section)
+                current_tokens += part_tokens
+            else:
+                yield flush()
+                current_parts, current_meta, current_tokens = [part_text], [section], part_tokens
+
+    if current_parts:
+        yield flush()
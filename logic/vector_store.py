@@ -0,0 +1,386 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from index_factory import META_FILE, read_index_meta, set_search_params, write_index_meta
+from lexical_index import LEXICAL_FILE, build_lexical_index, load_lexical_index, rrf_fuse
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.sqlite"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+# A store folder holds immutable versions/<version>/ folders and a CURRENT
+# file naming the published one
+CURRENT_FILE = "CURRENT"
+VERSIONS_FOLDER = "versions"
+KEEP_VERSIONS = 3
+RETENTION_SECONDS = 300  # superseded versions stay readable this long for searches in flight
+
+# "hybrid" fuses vector and BM25 results, "lexical" needs no query embedding
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+FUSION_CANDIDATES = 2  # each ranking brings FUSION_CANDIDATES * k results to the fusion
+
+
+def mmap_flags(index_type):
+    """faiss.read_index flags mapping an index's vectors from disk instead of reading them."""
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY  # inverted lists
+    return faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY  # flat codes, also under HNSW
+
+
+def current_version(folder):
+    """Name of the published version of a store, None if it was never published."""
+    try:
+        with open(os.path.join(folder, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_path(folder, version=None):
+    """Folder with the files of a version of a store, the published one by default.
+
+    Stores saved before versioning keep their files in the store folder itself.
+    """
+    version = version or current_version(folder)
+    return os.path.join(folder, VERSIONS_FOLDER, version) if version else folder
+
+
+def store_exists(folder):
+    return files_exist(version_path(folder))
+
+
+def files_exist(path):
+    return all(os.path.exists(os.path.join(path, name)) for name in (INDEX_FILE, DOCSTORE_FILE))
+
+
+def store_meta(folder):
+    """Index metadata of the published version of a store."""
+    return read_index_meta(version_path(folder))
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore reading chunks from docstore.sqlite one by one.
+
+    Only the chunks a search returns are read, so opening it costs nothing
+    whatever the corpus size. positions maps index positions to chunk ids
+    the same way (see ChunkPositions).
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.positions = ChunkPositions(self._db)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(chunks)")}
+        self.has_pages = {"page_start", "page_end"} <= columns  # docstores written before lack them
+
+    def positions_in_pages(self, first_page, last_page):
+        """Index positions of the chunks overlapping a page range, None if the docstore has no page columns."""
+        if not self.has_pages:
+            return None
+        rows = self._db.execute(
+            "SELECT position FROM chunks WHERE page_start <= ? AND page_end >= ?", (last_page, first_page)
+        )
+        return [row[0] for row in rows]
+
+    def search(self, search):
+        row = self._db.execute("SELECT text, metadata FROM chunks WHERE chunk_id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def close(self):
+        self._db.close()
+
+
+class ChunkPositions(Mapping):
+    """Index position -> chunk id, looked up in the docstore on access."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, position):
+        row = self._db.execute("SELECT chunk_id FROM chunks WHERE position = ?", (int(position),)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self):
+        return (row[0] for row in self._db.execute("SELECT position FROM chunks ORDER BY position"))
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+def write_docstore(path, db):
+    """Write the chunks of a FAISS store to a SQLite docstore, keyed by index position and chunk id.
+
+    The page range of each chunk is also stored in its own columns, so page
+    filters select positions in SQL (see SQLiteDocstore.positions_in_pages).
+    """
+    rows = (
+        (
+            position,
+            chunk_id,
+            document.page_content,
+            json.dumps(document.metadata, ensure_ascii=False),
+            document.metadata.get("page_start"),
+            document.metadata.get("page_end"),
+        )
+        for position, chunk_id in sorted(db.index_to_docstore_id.items())
+        for document in [db.docstore.search(chunk_id)]
+    )
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE chunks (position INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, "
+            "text TEXT NOT NULL, metadata TEXT NOT NULL, page_start INTEGER, page_end INTEGER)"
+        )
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("CREATE INDEX chunks_pages ON chunks (page_start, page_end)")
+    conn.close()
+
+
+def save_store(db, folder, metadata, keep=KEEP_VERSIONS, retention=RETENTION_SECONDS):
+    """Save a FAISS store as a new version and publish it; returns the version name.
+
+    The version folder gets index.faiss, docstore.sqlite, lexical.npz (the
+    BM25 index of the same chunks) and index_meta.json (no pickle) and is
+    never modified afterwards. It is published by
+    replacing the CURRENT file, a single atomic rename, so readers see either
+    the previous version or the new one and keep serving the previous one
+    until then. Old versions are then removed (see gc_versions).
+    """
+    version = f"v{time.time_ns()}"
+    path = version_path(folder, version)
+    os.makedirs(path)
+
+    faiss.write_index(db.index, os.path.join(path, INDEX_FILE))
+    write_docstore(os.path.join(path, DOCSTORE_FILE), db)
+    positions = sorted(db.index_to_docstore_id)
+    build_lexical_index(
+        positions, (db.docstore.search(db.index_to_docstore_id[position]).page_content for position in positions)
+    ).save(os.path.join(path, LEXICAL_FILE))
+    write_index_meta(path, dict(metadata, ntotal=db.index.ntotal, version=version))
+
+    current_path = os.path.join(folder, CURRENT_FILE)
+    tmp_path = f"{current_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, current_path)
+
+    # Files of a store saved before versioning
+    for name in (INDEX_FILE, DOCSTORE_FILE, META_FILE, LEGACY_DOCSTORE_FILE):
+        if os.path.exists(os.path.join(folder, name)):
+            os.remove(os.path.join(folder, name))
+
+    gc_versions(folder, keep, retention)
+    return version
+
+
+def gc_versions(folder, keep=KEEP_VERSIONS, retention=RETENTION_SECONDS):
+    """Delete the versions of a store beyond the newest keep, once superseded for retention seconds.
+
+    The published version is always kept. Searches that already loaded a
+    deleted version keep working (its files stay open); retention covers
+    those that read CURRENT just before the swap and open the files after.
+    """
+    versions_folder = os.path.join(folder, VERSIONS_FOLDER)
+    if not os.path.isdir(versions_folder):
+        return []
+    versions = sorted(os.listdir(versions_folder))  # v<nanoseconds>, oldest first
+    kept = set(versions[-keep:]) | {current_version(folder)}
+    now = time.time()
+    removed = []
+    for older, newer in zip(versions, versions[1:]):
+        superseded = os.path.getmtime(os.path.join(versions_folder, newer))
+        if older not in kept and now - superseded > retention:
+            shutil.rmtree(os.path.join(versions_folder, older), ignore_errors=True)
+            removed.append(older)
+    if removed:
+        print(f"[INFO] Removed {len(removed)} old index versions from {folder}")
+    return removed
+
+
+def load_store(folder, embeddings, mmap=True):
+    """Load the published version of a store saved by save_store; returns (db, metadata).
+
+    With mmap=True (for searching) the index is memory-mapped read-only and
+    chunks are read from SQLite on demand, so loading takes milliseconds and
+    replicas share the vectors through the page cache. With mmap=False the
+    index and docstore are read into memory so they can be updated.
+    """
+    version = current_version(folder)
+    path = version_path(folder, version)
+    if not files_exist(path):
+        if os.path.exists(os.path.join(folder, LEGACY_DOCSTORE_FILE)):
+            raise FileNotFoundError(f"{folder} holds a pickled index, vectorize the chunks again to convert it")
+        raise FileNotFoundError(f"No vector store in {folder}")
+
+    metadata = read_index_meta(path)
+    metadata.setdefault("version", version)
+    index_path = os.path.join(path, INDEX_FILE)
+    docstore_path = os.path.join(path, DOCSTORE_FILE)
+
+    if mmap:
+        index = faiss.read_index(index_path, mmap_flags(metadata["index_type"]))
+        docstore = SQLiteDocstore(docstore_path)
+        index_to_docstore_id = docstore.positions
+    else:
+        index = faiss.read_index(index_path)
+        documents = {}
+        index_to_docstore_id = {}
+        with sqlite3.connect(f"file:{docstore_path}?mode=ro", uri=True) as conn:
+            for position, chunk_id, text, chunk_metadata in conn.execute(
+                "SELECT position, chunk_id, text, metadata FROM chunks"
+            ):
+                documents[chunk_id] = Document(id=chunk_id, page_content=text, metadata=json.loads(chunk_metadata))
+                index_to_docstore_id[position] = chunk_id
+        conn.close()
+        docstore = InMemoryDocstore(documents)
+
+    db = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+    return db, metadata
+
+
+def load_lexical(folder, version=None):
+    """BM25 index of a version of a store (the published one by default), None for older stores."""
+    path = os.path.join(version_path(folder, version), LEXICAL_FILE)
+    return load_lexical_index(path) if os.path.exists(path) else None
+
+
+def page_filter(first_page: int, last_page: int):
+    """Metadata filter keeping the chunks that overlap a page range."""
+    def overlaps(metadata):
+        start = metadata.get("page_start")
+        end = metadata.get("page_end")
+        return start is not None and start <= last_page and end >= first_page
+    return overlaps
+
+
+def page_positions(db, pages):
+    """Index positions of the chunks of a loaded store overlapping pages=(first, last).
+
+    Read from the docstore's page columns; None when the docstore cannot
+    tell without reading every chunk (SQLite docstores written before them).
+    """
+    if isinstance(db.docstore, SQLiteDocstore):
+        return db.docstore.positions_in_pages(*pages)
+    if isinstance(db.docstore, InMemoryDocstore):
+        keep = page_filter(*pages)
+        return [
+            position for position, chunk_id in db.index_to_docstore_id.items()
+            if keep(db.docstore.search(chunk_id).metadata)
+        ]
+    return None
+
+
+def search_positions(db, vector, k, positions, nprobe=None, ef_search=None):
+    """Search only the vectors at the given index positions; returns [(Document, L2 distance)].
+
+    The positions are passed to FAISS as an IDSelectorBatch, so the search
+    itself skips the other vectors and only the k hits are read from the docstore.
+    """
+    if not len(positions):
+        return []
+    selector = faiss.IDSelectorBatch(np.asarray(positions, dtype=np.int64))
+    if faiss.try_extract_index_ivf(db.index) is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe or 1)
+    elif isinstance(faiss.downcast_index(db.index), faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search or 16)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    query = np.asarray([vector], dtype=np.float32)
+    distances, ids = db.index.search(query, min(k, len(positions)), params=params)
+    return [
+        (db.docstore.search(db.index_to_docstore_id[int(position)]), float(distance))
+        for position, distance in zip(ids[0], distances[0])
+        if position != -1
+    ]
+
+
+def search_store(db, metadata, vector, k=3, pages=None, nprobe=None, ef_search=None):
+    """Search a loaded store with a query embedding; returns [(Document, L2 distance)], closest first.
+
+    pages=(first, last) keeps the chunks overlapping that page range: only
+    their vectors are searched. nprobe and ef_search default to the values
+    the index was built with.
+    """
+    params = metadata["params"]
+    nprobe = nprobe or params.get("nprobe")
+    ef_search = ef_search or params.get("ef_search")
+    set_search_params(db.index, nprobe, ef_search)
+    if not pages:
+        return db.similarity_search_with_score_by_vector(vector, k=k)
+
+    positions = page_positions(db, pages)
+    if positions is not None:
+        return search_positions(db, vector, k, positions, nprobe, ef_search)
+
+    # Docstores without page columns: the filter is applied after the search,
+    # so fetch more candidates until k of them pass or every vector was seen
+    fetch_k = 4 * k
+    while True:
+        hits = db.similarity_search_with_score_by_vector(vector, k=k, filter=page_filter(*pages), fetch_k=fetch_k)
+        if len(hits) >= k or fetch_k >= db.index.ntotal:
+            return hits
+        fetch_k *= 2
+
+
+def lexical_search(db, lexical, query, k=3, pages=None):
+    """Search a loaded store with its BM25 index; returns [(Document, BM25 score)], best first.
+
+    No embedding is needed. Only the returned chunks are read from the docstore.
+    """
+    if not pages:
+        hits = lexical.search(query, k)
+        return [(db.docstore.search(db.index_to_docstore_id[position]), score) for position, score in hits]
+
+    positions = page_positions(db, pages)
+    allowed = set(positions) if positions is not None else None
+    keep = page_filter(*pages)
+    results = []
+    # Hits in score order until k of them are in the page range; only those are
+    # read from the docstore when it knows the pages of each chunk
+    for position, score in lexical.search(query):
+        if allowed is not None and position not in allowed:
+            continue
+        doc = db.docstore.search(db.index_to_docstore_id[position])
+        if allowed is not None or keep(doc.metadata):
+            results.append((doc, score))
+            if len(results) == k:
+                break
+    return results
+
+
+def fuse_results(vector_results, lexical_results, k=3, mode="hybrid"):
+    """Top k documents of a search mode from vector results (closest first) and lexical ones (best first).
+
+    hybrid merges both lists by reciprocal-rank fusion, so neither the L2
+    distances nor the BM25 scores need to be comparable.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+    if mode == "vector":
+        return [doc for doc, _ in vector_results[:k]]
+    if mode == "lexical":
+        return [doc for doc, _ in lexical_results[:k]]
+    rankings = ([doc for doc, _ in vector_results], [doc for doc, _ in lexical_results])
+    fused = rrf_fuse(rankings, key=lambda doc: (doc.metadata.get("doc_id"), doc.id or doc.page_content))
+    return [doc for doc, _ in fused[:k]]